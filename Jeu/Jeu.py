@@ -10,9 +10,6 @@ Votre version sera forcément différente.
 Donc, vous pouvez ajouter/retirer des variables et/ou des fonctions et/ou des paramètres.
 
 """
-from debugpy.common.timestamp import current
-from qtconsole.mainwindow import background
-
 try:  # import as appropriate for 2.x vs. 3.x
     import tkinter as tk
     import tkinter.messagebox as tkMessageBox
@@ -21,101 +18,151 @@ except:
     import tkMessageBox
 
 from sokobanXSBLevels import *
-from enum import Enum
+from sokobanBoard import *
+from sokobanEngine import *
+from sokobanAnalyse import deadSquares
+from sokobanHint import HintEngine
+from sokobanSolutions import SolutionDB
+import collections
 import json
+import os
+import weakref
 
-"""
-Direction :
-    Utile pour gérer le calcul des positions pour les mouvements
-"""
-
-
-class Direction(Enum):
-    Up = 1
-    Down = 2
-    Left = 3
-    Right = 4
-
+# Intervalle (ms) entre deux vérifications du calcul d'un indice (root.after)
+HINT_POLL_DELAY = 100
+# Images de fond (SpriteCache.staticLayer) gardées par racine Tk : les derniers niveaux affichés
+STATIC_LAYERS = 4
 
 """
-Position :
-    - stockage de coordonnées x et y,
-    - vérification de x et y par rapport à une matrice
-    - calcule de position relative à partir d'un offset (un décalage) et une direction 
+SpriteCache : registre des images du jeu.
+    Chaque fichier PNG n'est décodé qu'une seule fois par racine Tk, puis l'image est partagée
+    par toutes les tuiles (Wall, Goal, Box, Mover).
+    #decodes compte les décodages effectués par fichier : il doit valoir 1 par image et par racine.
+    Les images de fond des niveaux (#staticLayer) ne sont gardées que pour les STATIC_LAYERS derniers
+    niveaux affichés (la plus grande fait plusieurs Mo).
 """
-class Position(object):
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-
-    def __str__(self):
-        return 'Position(' + str(self.x) + ',' + str(self.y) + str(')')
-
-    def getX(self):
-        return self.x
-
-    def getY(self):
-        return self.y
-
-    # retoune la position vers la direction #direction en tenant compte de l'offset
-    #   Position(3,4).positionTowards(Direction.Right, 2) == Position(5,4)
-    def positionTowards(self, direction, offset):
-        if direction == Direction.Up:
-            return Position(self.x, self.y - offset)
-        elif direction == Direction.Down:
-            return Position(self.x, self.y + offset)
-        elif direction == Direction.Left:
-            return Position(self.x - offset, self.y)
-        elif direction == Direction.Right:
-            return Position(self.x + offset, self.y)
+class SpriteCache(object):
+    imageDir = os.path.dirname(os.path.abspath(__file__))  # Les PNG sont à côté de ce fichier
+    decodes = {}  # nom de fichier -> nombre de décodages PhotoImage
+    _roots = weakref.WeakKeyDictionary()  # racine Tk -> {nom de fichier: PhotoImage}
+    _layers = weakref.WeakKeyDictionary()  # racine Tk -> OrderedDict(niveau: PhotoImage), le plus récent en dernier
+
+    @classmethod
+    def get(cls, canvas, fileName):
+        """Retourne l'image #fileName pour la racine Tk du canvas, en la décodant au premier appel."""
+        root = canvas._root()
+        images = cls._roots.setdefault(root, {})
+        image = images.get(fileName)
+        if image is None:
+            image = tk.PhotoImage(master=root, file=os.path.join(cls.imageDir, fileName))
+            images[fileName] = image
+            cls.decodes[fileName] = cls.decodes.get(fileName, 0) + 1
+        return image
+
+    @classmethod
+    def decodeCount(cls, fileName=None):
+        """Nombre de décodages pour #fileName, ou pour toutes les images si fileName est None."""
+        if fileName is None:
+            return sum(cls.decodes.values())
+        return cls.decodes.get(fileName, 0)
+
+    @classmethod
+    def staticLayer(cls, canvas, xsbMatrix, tileSize=64):
+        """
+        Retourne une image unique contenant tous les Wall et Goal du niveau (la couche "static").
+        L'image est composée au premier appel puis mise en cache par contenu du niveau :
+        recharger l'un des STATIC_LAYERS derniers niveaux ne recompose rien.
+        """
+        root = canvas._root()
+        layers = cls._layers.setdefault(root, collections.OrderedDict())
+        staticRows = tuple(''.join(cls.staticChar(char) for char in line) for line in xsbMatrix)
+        key = (tileSize, staticRows)
+        layer = layers.get(key)
+        if layer is not None:
+            layers.move_to_end(key)
         else:
-            return Position(self.x, self.y)
-
-    # Retourne True si les coordonnées sont valides dans le wharehouse
-    def isValidInWharehouse(self, wharehouse):
-        return wharehouse.isPositionValid(self)
-
-    # Convertit le receveur en une position correspondante dans un Canvas
-    def asCanvasPositionIn(self, elem):
-        lx = self.getX() * elem.getWidth()
-        ly = self.getY() * elem.getHeight()
-        return Position(lx, ly)
+            nbcolumns = max(len(line) for line in staticRows) if staticRows else 0
+            layer = tk.PhotoImage(master=root, width=max(nbcolumns * tileSize, 1),
+                                  height=max(len(staticRows) * tileSize, 1))
+            tiles = {'#': cls.get(canvas, 'wall.png'), '.': cls.get(canvas, 'goal.png')}
+            for y, line in enumerate(staticRows):
+                for x, char in enumerate(line):
+                    if char in tiles:
+                        # Copie de la tuile dans l'image de fond (commande Tk "copy ... -to x y")
+                        layer.tk.call(layer.name, 'copy', tiles[char].name, '-to', x * tileSize, y * tileSize)
+            layers[key] = layer
+            while len(layers) > STATIC_LAYERS:
+                layers.popitem(last=False)  # l'image reste affichée tant que son Level la référence
+        return layer
+
+    @staticmethod
+    def staticChar(char):
+        """Réduit un caractère xsb à sa partie statique : '#' pour un mur, '.' pour un objectif, ' ' sinon."""
+        if char == '#':
+            return '#'
+        if char in '.+*':
+            return '.'
+        return ' '
 
 
 """
 WharehousePlan : Plan de l'entrepot pour stocker les éléments.
-    Les éléments sont stockés dans une matrice (#rawMatrix)
+    L'état du jeu est un GameState (#state, voir sokobanEngine) qui applique les règles sur un
+    CompactBoard (#board) : deux tableaux d'octets, l'un pour la couche immuable (sol, objectifs, murs),
+    l'autre pour les caisses et le joueur.
+    Le plan est un observateur du GameState : les objets Tk (Wall, Goal, Box, Mover) ne sont que
+    des vues sur le plateau, retrouvées par leur index plat (#staticViews, #boxViews) et mises à jour
+    par #boxMoved et #moverMoved.
 """
 class WharehousePlan(object):
     """Plan de l'entrepôt pour le jeu Sokoban."""
 
     def __init__(self, score):
-        self.rawMatrix = [] # La matrice d'éléments vide
+        self.state = None  # L'état de la partie (moteur sans affichage)
+        self.staticViews = {}  # index -> Wall ou Goal
+        self.boxViews = {}  # index -> Box
+        self.floor = Floor()  # Vue partagée par toutes les cases de sol
         self.mover = None  # Stocke le joueur
         self.score = score # Stocke le score
+        self.dead = None  # cases mortes (voir setDeadSquares)
+        self.deadBoxCount = 0  # caisses posées sur une case morte, tenu à jour par #boxMoved
 
-    def appendRow(self, row):
-        """Ajoute une nouvelle ligne à la matrice."""
-        self.rawMatrix.append(row)
+    def setState(self, state):
+        """Définit l'état de la partie et s'abonne à ses déplacements."""
+        self.state = state
+        state.addObserver(self)
 
-    def at(self, position):
-        """Retourne l'élément à la position donnée."""
-        if not self.isPositionValid(position): #Gestion de l'erreur en dehors des limites
-            #Affiche la position de l'erreur
-            raise IndexError(f"Position invalide: {position}")
-        return self.rawMatrix[position.getY()][position.getX()]
+    @property
+    def board(self):
+        """Le plateau compact de la partie."""
+        return self.state.board
 
-    def atPut(self, position, elem):
-        """Place un élément à la position donnée."""
+    @property
+    def boxesOnGoal(self):
+        """Nombre de caisses sur un objectif (tenu à jour par le GameState)."""
+        return self.state.boxesOnGoal
+
+    def at(self, position):
+        """Retourne l'élément à la position donnée (l'objet déplaçable s'il y en a un)."""
         if not self.isPositionValid(position): #Gestion de l'erreur en dehors des limites
             #Affiche la position de l'erreur
             raise IndexError(f"Position invalide: {position}")
-        self.rawMatrix[position.getY()][position.getX()] = elem
+        index = position.asIndexIn(self.board)
+        if self.board.dynamic[index] == MOVER:
+            return self.mover
+        if self.board.dynamic[index] == BOX:
+            return self.boxViews[index]
+        return self.staticViews.get(index, self.floor)
 
     def isPositionValid(self, position):
         """Vérifie si une position est valide dans la matrice."""
-        return (0 <= position.getY() < len(self.rawMatrix) and
-                0 <= position.getX() < len(self.rawMatrix[position.getY()]))
+        return (0 <= position.getX() < self.board.width - 2 and
+                0 <= position.getY() < self.board.height - 2 and
+                self.board.isInside(position.asIndexIn(self.board)))
+
+    def addStatic(self, index, elem):
+        """Enregistre la vue (Wall ou Goal) de la case #index."""
+        self.staticViews[index] = elem
 
     def setMover(self, mover):
         """Définit le joueur."""
@@ -124,7 +171,40 @@ class WharehousePlan(object):
     def getMover(self):
         """Retourne le joueur."""
         return self.mover
-        
+
+    def addBox(self, box):
+        """Enregistre une caisse de l'entrepôt."""
+        self.boxViews[box.index] = box
+        if self.dead is not None and self.dead[box.index]:
+            self.deadBoxCount += 1
+
+    def setDeadSquares(self, dead):
+        """Définit les cases mortes (voir sokobanAnalyse.deadSquares) et compte les caisses qui y sont."""
+        self.dead = dead
+        self.deadBoxCount = sum(1 for index in self.boxViews if dead[index])
+
+    def boxMoved(self, fromIndex, toIndex, direction):
+        """Notification du GameState (pas joué, annulé ou rejoué) : met à jour la vue de la caisse et le score."""
+        box = self.boxViews.pop(fromIndex)
+        self.boxViews[toIndex] = box
+        if self.dead is not None:
+            self.deadBoxCount += self.dead[toIndex] - self.dead[fromIndex]
+        wasOnGoal = box.onGoal
+        box.moveTowards(direction)
+        if box.onGoal and not wasOnGoal:
+            self.score.player_score += 100 #Augmente de 100 le score du joueur
+        elif wasOnGoal and not box.onGoal:
+            self.score.player_score -= 100 #Retire les 100 points gagnés par cette caisse
+
+    def moverMoved(self, fromIndex, toIndex, direction):
+        """Notification du GameState : met à jour la vue du joueur et le nombre de déplacements."""
+        self.mover.moveTowards(direction)
+        self.score.player_deplacement = self.state.moves  # suit aussi les pas annulés
+
+    def isSolved(self):
+        """Vrai si toutes les caisses sont sur un objectif (en temps constant)."""
+        return self.state.isSolved()
+
 """
 Floor :
     Représente une case vide de la matrice
@@ -158,11 +238,12 @@ Goal :
         et self.canvas.tag_raise("movable","static") dans Level
 """
 class Goal(object):
-    """Initialise un objectif"""
-    def __init__(self, canvas, position):
-        self.image = tk.PhotoImage(file='goal.png')
+    """Initialise un objectif (draw=False quand la couche statique est pré-rendue par Level)"""
+    def __init__(self, canvas, position, draw=True):
+        self.image = SpriteCache.get(canvas, 'goal.png')
         self.canvas = canvas
-        self.canvas.create_image(position.getX() * 64 + 32, position.getY() * 64 + 32, image=self.image, tags="static")
+        if draw:
+            self.canvas.create_image(position.getX() * 64 + 32, position.getY() * 64 + 32, image=self.image, tags="static")
 
     def isMovable(self):
         return False
@@ -191,11 +272,12 @@ Wall : pour délimiter les murs
         et self.canvas.tag_raise("movable","static") dans Level
 """
 class Wall(object):
-    """Initialise un mur"""
-    def __init__(self, canvas, position):
-        self.image = tk.PhotoImage(file='wall.png')
+    """Initialise un mur (draw=False quand la couche statique est pré-rendue par Level)"""
+    def __init__(self, canvas, position, draw=True):
+        self.image = SpriteCache.get(canvas, 'wall.png')
         self.canvas = canvas
-        self.canvas.create_image(position.getX() * 64 + 32, position.getY() * 64 + 32, image=self.image, tags="static") #Crée l'image du Mur(64x64) en decalent de 32 px en X et Y (car 0,0 est au centre de l'image)
+        if draw:
+            self.canvas.create_image(position.getX() * 64 + 32, position.getY() * 64 + 32, image=self.image, tags="static") #Crée l'image du Mur(64x64) en decalent de 32 px en X et Y (car 0,0 est au centre de l'image)
 
     def getHeight(self):
         return self.height
@@ -218,8 +300,8 @@ class Wall(object):
 
 """
 Box : Caisse à déplacer par le déménageur.
-    Etant donné qu'une caisse doit être déplacé, le canvas et la matrice sont necessaires pour
-    reconstruire l'image et mettre en oeuvre sont déplacement (dans le canvas et dans la matrice)
+    Le déplacement est joué par le GameState (sokobanEngine), la caisse ne fait que suivre
+    dans le canvas (#moveTowards est appelé par le plan sur notification du GameState)
     Un Box est "movable", il est toujours déssiné au dessus des objets "static" :
         Le zOrder est assuré par le tag du create_image (tag='movable')
         et self.canvas.tag_raise("movable","static") dans Level
@@ -234,12 +316,13 @@ class Box(object):
         self.height = 64
         self.canvas = canvas
         self.position = position
+        self.index = position.asIndexIn(wharehouse.board)  # index plat dans le plateau compact
         self.wharehouse = wharehouse
         self.onGoal = onGoal
         if onGoal:
-            self.image= tk.PhotoImage(file='boxOnTarget.png')
+            self.image = SpriteCache.get(canvas, 'boxOnTarget.png')
         else:
-            self.image = tk.PhotoImage(file='box.png')
+            self.image = SpriteCache.get(canvas, 'box.png')
         self.imageId = self.canvas.create_image(
             self.position.getX() * self.width + self.width / 2,
             self.position.getY() * self.height + self.height / 2,
@@ -259,26 +342,17 @@ class Box(object):
     def canBeCovered(self):
         return False
 
-    #Verifie si la prochaine position du joueur est disponible où est un mur
+    # Vue : suit la caisse que le GameState vient de déplacer vers #direction
     def moveTowards(self, direction):
-        nextPos = self.position.positionTowards(direction, 1)
-        nextElement = self.wharehouse.at(nextPos)
-        if nextElement is None or not nextElement.canBeCovered():
-            return False
-        # Mise à jour de la matrice
-        # Remplacer l'ancienne instance du Mover par un Floor
-        self.wharehouse.atPut(self.position, Floor())
-        self.position = nextPos
-        element = self.wharehouse.at(self.position)
-        if isinstance(element,Goal):
-            self.onGoal = True #si la boite est sur l'objectif
-            self.wharehouse.score.player_score += 100 #Augmente de 100 le score du joueur
-            
-        # Ajoute la boite sur la position suivante
-        self.wharehouse.atPut(self.position, self)
-
-        # Mise à jour de l'état onGoal
-        self.updateImage()
+        board = self.wharehouse.board
+        self.index += board.offsets[direction]
+        self.position = self.position.positionTowards(direction, 1)
+        wasOnGoal = self.onGoal
+        self.onGoal = board.isGoal(self.index) #si la boite est sur l'objectif
+
+        # L'image ne change que si l'état onGoal a changé
+        if self.onGoal != wasOnGoal:
+            self.updateImage()
 
         # Mise à jour de l'affichage
         canvasPos = self.position.asCanvasPositionIn(self)
@@ -291,17 +365,11 @@ class Box(object):
 
     def updateImage(self):
         if self.onGoal: #si la boite est sur l'objectif
-            self.image = tk.PhotoImage(file='boxOnTarget.png') #on change l'image
+            self.image = SpriteCache.get(self.canvas, 'boxOnTarget.png') #on change l'image
         else:
-            self.image = tk.PhotoImage(file='box.png')
-        self.canvas.delete(self.imageId)
-        self.imageId = self.canvas.create_image(
-            self.position.getX() * self.width + self.width / 2,
-            self.position.getY() * self.height + self.height / 2,
-            image=self.image,
-            tags="movable"
-        )
-
+            self.image = SpriteCache.get(self.canvas, 'box.png')
+        # Remplace l'image de l'item existant, sans recréer d'item
+        self.canvas.itemconfig(self.imageId, image=self.image)
 
     def xsbChar(self):
         return '*' if self.onGoal else '$'
@@ -312,9 +380,8 @@ class Box(object):
 
 """
 Mover : C'est  le déménageur.
-    La classe Mover met en oeuvre la logique du jeu dans #canMove et #moveTowards.
-    Etant donné qu'un Mover se déplace, le canvas et la matrice sont necessaires pour
-    reconstruire l'image et mettre en oeuvre sont déplacement (dans le canvas et dans la matrice)
+    La logique du jeu est dans le GameState (sokobanEngine) : #push lui demande de jouer le pas,
+    puis le GameState notifie le plan qui appelle #moveTowards pour mettre à jour l'affichage.
     Un Mover est "movable", il est toujours déssiné au dessus des objets "static" :
         Le zOrder est assuré par le tag du create_image (tag='movable')
         et self.canvas.tag_raise("movable","static") dans Level
@@ -331,7 +398,7 @@ class Mover(object):
         self.onGoal = onGoal
         self.width = 64
         self.height = 64
-        self.image = tk.PhotoImage(file='player.png')
+        self.image = SpriteCache.get(canvas, 'player.png')
         self.player = self.canvas.create_image(
             self.position.getX() * self.width + self.width / 2,
             self.position.getY() * self.height + self.height / 2,
@@ -349,52 +416,12 @@ class Mover(object):
         return True
 
     def canMove(self, direction): #Verifie si le chemin est libre
-        nextPos = self.position.positionTowards(direction, 1)
-        if not self.wharehouse.isPositionValid(nextPos):
-            return False
-        nextElement = self.wharehouse.at(nextPos)
-
-        if isinstance(nextElement, (Floor, Goal)):
-            return True
-        elif isinstance(nextElement, Box):
-            boxNextPos = nextPos.positionTowards(direction, 1)
-            if not self.wharehouse.isPositionValid(boxNextPos):
-                return False
-            boxNextElement = self.wharehouse.at(boxNextPos)
-            if isinstance(boxNextElement, (Floor, Goal)):
-                return True
-        return False
-
-    def moveTowards(self, direction): #Bouge a la direction visé (Up, Down...)
-        if not self.canMove(direction):
-            return
-
-        self.wharehouse.score.player_deplacement += 1
+        return self.wharehouse.state.canMove(direction)
 
-        nextPos = self.position.positionTowards(direction, 1)
-        nextElement = self.wharehouse.at(nextPos)
-
-        # Mise à jour de la matrice
-        self.wharehouse.atPut(self.position, Floor())
-
-        if self.onGoal:
-            self.wharehouse.atPut(self.position, Goal(self.canvas, self.position))
-        else:
-            self.wharehouse.atPut(self.position, Floor())
-
-        currentElement = self.wharehouse.at(nextPos)
-        if isinstance(currentElement, Goal):
-            self.onGoal = True
-        else:
-            self.onGoal = False
-
-        if isinstance(nextElement, Box):
-            if nextElement.onGoal:
-                self.onGoal = True
-            nextElement.moveTowards(direction)
-
-        self.position = nextPos
-        self.wharehouse.atPut(self.position, self)
+    # Vue : suit le joueur que le GameState vient de déplacer vers #direction
+    def moveTowards(self, direction):
+        self.position = self.position.positionTowards(direction, 1)
+        self.onGoal = self.wharehouse.board.isGoal(self.position.asIndexIn(self.wharehouse.board))
 
         # Mise à jour de l'affichage
         canvasPos = self.position.asCanvasPositionIn(self)
@@ -406,19 +433,19 @@ class Mover(object):
 
     def setupImageForDirection(self, direction):
         if direction == Direction.Up:
-            self.image = tk.PhotoImage(file='playerUp.png')
+            self.image = SpriteCache.get(self.canvas, 'playerUp.png')
         elif direction == Direction.Down:
-            self.image = tk.PhotoImage(file='playerDown.png')
+            self.image = SpriteCache.get(self.canvas, 'playerDown.png')
         elif direction == Direction.Left:
-            self.image = tk.PhotoImage(file='playerLeft.png')
+            self.image = SpriteCache.get(self.canvas, 'playerLeft.png')
         elif direction == Direction.Right:
-            self.image = tk.PhotoImage(file='playerRight.png')
+            self.image = SpriteCache.get(self.canvas, 'playerRight.png')
 
         self.canvas.itemconfig(self.player, image=self.image)
 
     def push(self, direction):
         self.setupImageForDirection(direction)
-        self.moveTowards(direction)
+        return self.wharehouse.state.move(direction)  # Le GameState notifie les vues (#moveTowards)
 
     def xsbChar(self):
         return '+' if self.onGoal else '@'
@@ -489,8 +516,11 @@ class Score(object):
     Le jeux avec tout ce qu'il faut pour dessiner et stocker/gérer la matrice d'éléments
 """
 class Level(object):
-    def __init__(self, root, xsbMatrix, frame):
+    # prerenderStatic=True : tous les Wall et Goal sont dessinés dans une seule image de fond
+    # (SpriteCache.staticLayer), seuls le Mover et les Box restent des items séparés du canvas.
+    def __init__(self, root, xsbMatrix, frame, prerenderStatic=True):
         self.root = root
+        self.prerenderStatic = prerenderStatic
         self.score = Score("User")
         self.warehouse = WharehousePlan(self.score)
         self.frame = frame
@@ -504,13 +534,20 @@ class Level(object):
 
         self.height = nbrows * self.tile_size
         self.width = nbcolumns * self.tile_size
+        Position.internFor(nbcolumns, nbrows)
 
         # Création du canvas
         self.canvas = tk.Canvas(self.root, width=self.width, height=self.height, bg="gray")
         self.canvas.pack()
 
+        # Couche statique pré-rendue, créée en premier pour rester sous les objets "movable"
+        if self.prerenderStatic:
+            self.staticImage = SpriteCache.staticLayer(self.canvas, xsbMatrix, self.tile_size)
+            self.canvas.create_image(0, 0, anchor='nw', image=self.staticImage, tags="static")
+
         # Initialisation du plan de l'entrepôt à partir de la matrice
         self.initWarehouseFromXsb(xsbMatrix)
+        self.canvas.tag_raise("movable", "static")
 
         # Liaison des touches du clavier
         self.root.bind("<Key>", self.keypressed)
@@ -523,6 +560,15 @@ class Level(object):
         self.deplacements_text_id = self.canvas.create_text(10, 30, anchor='nw', 
                                                            text=f"Déplacements : {self.score.player_deplacement}", 
                                                            font=("Arial", 16), fill="white")
+        # Avertissement quand une caisse est poussée sur une case morte
+        self.warning_text_id = self.canvas.create_text(10, 50, anchor='nw', text="",
+                                                       font=("Arial", 16), fill="orange")
+        # Indice (touche H), calculé en arrière-plan par le solveur
+        database = SolutionDB()  # sans base (dossier de cache en lecture seule...), les indices restent calculés
+        self.hints = HintEngine(database if database.connection is not None else None)
+        self.hintShown = False  # un indice est affiché : il suit le joueur tant qu'il reste sur le chemin
+        self.hint_text_id = self.canvas.create_text(10, self.height - 10, anchor='sw', text="",
+                                                    font=("Arial", 16), fill="light green")
 
     def initWarehouseFromXsb(self, xsbMatrix):
         """
@@ -531,45 +577,26 @@ class Level(object):
             '#' = mur, '$' = caisse, '.' = objectif, '*' = caisse sur objectif,
             '@' = joueur, '+' = joueur sur objectif, '-' ou ' ' = sol
         """
+        self.warehouse.setState(GameState(xsbMatrix))
+        board = self.warehouse.board
+        # Cases d'où une caisse ne peut plus atteindre d'objectif (calculées une fois par niveau)
+        self.deadSquares = deadSquares(board)
+        self.warehouse.setDeadSquares(self.deadSquares)
         for y, line in enumerate(xsbMatrix):
-            row = []
             for x, char in enumerate(line):
                 pos = Position(x, y)
-                if char == '#':
-                    # Ajout d'un mur
-                    wall = Wall(self.canvas, pos)
-                    row.append(wall)
-                elif char == '@':
-                    # Ajout du joueur
-                    mover = Mover(self.canvas, self.warehouse, pos, onGoal=False)
-                    row.append(mover)
-                    self.warehouse.setMover(mover)
-                elif char == '+':
-                    # Ajout du joueur sur objectif
-                    mover = Mover(self.canvas, self.warehouse, pos, onGoal=True)
-                    row.append(mover)
-                    self.warehouse.setMover(mover)
-                elif char == '$':
-                    # Ajout d'une caisse
-                    box = Box(self.canvas, self.warehouse, pos, onGoal=False)
-                    row.append(box)
-                elif char == '*':
-                    # Ajout d'une caisse sur objectif
-                    box = Box(self.canvas, self.warehouse, pos, onGoal=True)
-                    row.append(box)
-                elif char in ['.', '-', ' ']:
-                    # Ajout d'un sol ou d'un objectif
-                    if char == '.':
-                        goal = Goal(self.canvas, pos)
-                        row.append(goal)
-                    else:
-                        floor = Floor()
-                        row.append(floor)
-                else:
-                    # Gestion des caractères inconnus en ajoutant un sol par défaut
-                    floor = Floor()
-                    row.append(floor)
-            self.warehouse.appendRow(row)
+                index = board.index(x, y)
+                # Couche statique : une vue par mur et par objectif (aussi sous '+' et '*')
+                if board.isWall(index):
+                    self.warehouse.addStatic(index, Wall(self.canvas, pos, draw=not self.prerenderStatic))
+                elif board.isGoal(index):
+                    self.warehouse.addStatic(index, Goal(self.canvas, pos, draw=not self.prerenderStatic))
+
+                # Couche dynamique : le joueur ou une caisse
+                if board.dynamic[index] == MOVER:
+                    self.warehouse.setMover(Mover(self.canvas, self.warehouse, pos, onGoal=board.isGoal(index)))
+                elif board.dynamic[index] == BOX:
+                    self.warehouse.addBox(Box(self.canvas, self.warehouse, pos, onGoal=board.isGoal(index)))
 
     def keypressed(self, event):
         """
@@ -593,24 +620,95 @@ class Level(object):
             mover.push(direction)
             self.update_score_display()
             self.checkWinCondition()
+        elif event.keysym in ('u', 'BackSpace'):
+            # Annule le dernier pas (seuls le joueur et la caisse concernée sont redessinés)
+            self.warehouse.state.undo()
+            self.update_score_display()
+        elif event.keysym == 'r':
+            # Rejoue le dernier pas annulé
+            self.warehouse.state.redo()
+            self.update_score_display()
+            self.checkWinCondition()
+        elif event.keysym in ('h', 'H'):
+            self.requestHint()
+
+    def requestHint(self):
+        """Affiche un indice : immédiatement s'il est en cache, sinon après un calcul en arrière-plan."""
+        state = self.warehouse.state
+        hint = self.hints.lookup(state)
+        if hint is not None:
+            self.showHint(hint)
+            return
+        if self.hints.hasFailed(state):
+            self.showHintText("Pas d'indice : aucune solution trouvée depuis cette position (u pour annuler)")
+            return
+        if not self.hints.busy:
+            self.hints.request(state)
+            hint = self.hints.lookup(state)  # position trouvée dans la base de solutions
+            if hint is not None:
+                self.showHint(hint)
+                return
+            self.root.after(HINT_POLL_DELAY, self.pollHint)
+        self.showHintText("Recherche d'un indice...")
+
+    def pollHint(self):
+        """Appelée par root.after tant que le calcul de l'indice n'est pas terminé."""
+        if not self.hints.busy:
+            return  # niveau fermé entre-temps
+        if not self.hints.poll():
+            self.root.after(HINT_POLL_DELAY, self.pollHint)
+            return
+        state = self.warehouse.state
+        hint = self.hints.lookup(state)
+        if hint is not None:
+            self.showHint(hint)
+        elif self.hints.hasFailed(state):
+            self.showHintText("Pas d'indice : aucune solution trouvée depuis cette position (u pour annuler)")
+        else:
+            self.showHintText("Position changée pendant la recherche : H pour un nouvel indice")
+
+    def showHint(self, hint):
+        self.hintShown = True
+        self.canvas.itemconfig(self.hint_text_id,
+                               text=f"Indice : {hint.lurd} ({hint.pushesLeft} poussées restantes)")
+
+    def showHintText(self, text):
+        self.hintShown = False
+        self.canvas.itemconfig(self.hint_text_id, text=text)
+
+    def update_hint_display(self):
+        """Après un pas : l'indice affiché est remplacé par le suivant s'il est en cache, sinon effacé."""
+        hint = self.hints.lookup(self.warehouse.state) if self.hintShown else None
+        if hint is not None:
+            self.showHint(hint)
+        elif not self.hints.busy:
+            self.showHintText("")
+
+    def update_warning_display(self):
+        if self.warehouse.deadBoxCount:  # tenu à jour à chaque poussée, sans parcourir les caisses
+            text = "Caisse bloquée : elle ne peut plus atteindre d'objectif (u pour annuler)"
+        else:
+            text = ""
+        self.canvas.itemconfig(self.warning_text_id, text=text)
 
     def update_score_display(self):
         self.canvas.itemconfig(self.score_text_id, text=f"Score : {self.score.getScore()}")
         self.canvas.itemconfig(self.deplacements_text_id, text=f"Déplacements : {self.score.player_deplacement}")
+        self.update_warning_display()
+        self.update_hint_display()
 
     def checkWinCondition(self):
         """
         Vérifie si toutes les caisses sont sur les objectifs.
         """
-        for row in self.warehouse.rawMatrix:
-            for element in row:
-                if isinstance(element, Box) and not element.onGoal:
-                    return  # Au moins une caisse n'est pas sur un objectif
+        if not self.warehouse.isSolved():
+            return  # Au moins une caisse n'est pas sur un objectif
 
         self.fin = self.canvas.create_text(10, 60, anchor='nw',
                                             text="Félicitations vous avez gagné",
                                             font=("Arial", 20), fill="pink")
         self.root.unbind("<Key>")  # Désactive les entrées clavier
+        self.hints.close()
         self.score.toFile("jeu.json")
         self.frame.destroy()
 
@@ -628,6 +726,7 @@ class Level(object):
         bouton_retour.pack()
 
     def retour_menu(self, frame):
+        self.hints.close()
         self.canvas.destroy()
         frame.destroy()
         Start_Menu(self.root, tk.Frame(self.root)).frame.pack(padx=10, pady=10)
@@ -674,4 +773,5 @@ class Sokoban(object):
     def play(self):
         self.root.mainloop()
 
-Sokoban().play()
+if __name__ == "__main__":
+    Sokoban().play()
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""
+Analyses d'un niveau calculées une fois au chargement, à partir de sa seule couche statique
+(murs, sols et objectifs). Les résultats sont mis en cache par contenu de la couche statique :
+un même niveau chargé plusieurs fois n'est analysé qu'une fois.
+
+Les tables de distances (#goalDistances) sont en plus enregistrées sur disque, dans le dossier
+cache/ à côté de ce fichier : un fichier par niveau, nommé d'après un hash de la couche statique.
+"""
+import hashlib
+import os
+from array import array
+
+from sokobanBoard import *
+
+# Distance des cases d'où une caisse ne peut atteindre un objectif
+INFINITY = 0xFFFF
+
+# Dossier des tables de distances ; à changer si le dossier du jeu n'est pas accessible en écriture
+cacheDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+DISTANCES_VERSION = b'goalDistances 1'  # à changer si le calcul ou le format des tables change
+
+_deadSquaresCache = {}  # (largeur, couche statique) -> bytes
+_goalDistancesCache = {}  # (largeur, couche statique) -> {objectif: array('H')}
+_tunnelSquaresCache = {}  # (largeur, couche statique) -> (bytes, bytes)
+_goalRoomsCache = {}  # (largeur, couche statique, couche mobile, joueur) -> [GoalRoom]
+
+
+def deadSquares(board):
+    """
+    Cases mortes du niveau : cases praticables depuis lesquelles une caisse ne peut atteindre
+    aucun objectif, même sans les autres caisses.
+    Calcul par accessibilité inverse : on "tire" une caisse depuis chaque objectif ; une case
+    jamais atteinte est morte. Retourne un bytes : 1 pour une case morte, 0 sinon.
+    """
+    key = (board.width, board.static)
+    dead = _deadSquaresCache.get(key)
+    if dead is None:
+        static = board.static
+        steps = (1, -1, board.width, -board.width)
+        alive = bytearray(len(static))
+        frontier = board.goalIndices()
+        for goal in frontier:
+            alive[goal] = 1
+        while frontier:
+            index = frontier.pop()
+            for step in steps:
+                # La caisse vient de index - step, poussée par un joueur en index - 2 * step
+                origin = index - step
+                if not alive[origin] and static[origin] < WALL and static[origin - step] < WALL:
+                    alive[origin] = 1
+                    frontier.append(origin)
+        dead = bytes(1 if code < WALL and not alive[index] else 0 for index, code in enumerate(static))
+        _deadSquaresCache[key] = dead
+    return dead
+
+
+def tunnelSquares(board):
+    """
+    Cases de tunnel : (horizontal, vertical), deux bytes valant 1 pour une case praticable bordée de
+    murs au-dessus et au-dessous (tunnel horizontal) ou à gauche et à droite (tunnel vertical).
+    """
+    key = (board.width, board.static)
+    tunnels = _tunnelSquaresCache.get(key)
+    if tunnels is None:
+        static = board.static
+        width = board.width
+        size = len(static)
+        horizontal = bytearray(size)
+        vertical = bytearray(size)
+        for index in range(width, size - width):
+            if static[index] < WALL:
+                horizontal[index] = static[index - width] == WALL and static[index + width] == WALL
+                vertical[index] = static[index - 1] == WALL and static[index + 1] == WALL
+        tunnels = (bytes(horizontal), bytes(vertical))
+        _tunnelSquaresCache[key] = tunnels
+    return tunnels
+
+
+"""
+GoalRoom : salle d'objectifs, zone contenant des objectifs et reliée au reste du niveau par une seule
+    case d'entrée (#entrance), elle-même reliée à une seule case extérieure (#outside).
+    - #cells : cases de la salle (entrée comprise)
+    - #fillOrder : ordre de remplissage des objectifs de la salle, chaque caisse arrivant par l'entrée
+    - #routes[k] : poussées (case de la caisse, case d'arrivée) amenant une caisse de l'entrée (joueur
+      en #outside) jusqu'à fillOrder[k], les k premiers objectifs étant déjà occupés
+"""
+class GoalRoom(object):
+    __slots__ = ('entrance', 'outside', 'cells', 'fillOrder', 'routes')
+
+    def __init__(self, entrance, outside, cells, fillOrder, routes):
+        self.entrance = entrance
+        self.outside = outside
+        self.cells = cells
+        self.fillOrder = fillOrder
+        self.routes = routes
+
+
+def goalRooms(board):
+    """
+    Salles d'objectifs du niveau (liste de GoalRoom), en ignorant les salles qui contiennent des caisses
+    ou le joueur au départ et celles dont aucun ordre de remplissage par l'entrée n'a été trouvé.
+    Pour un même ensemble d'objectifs, seule la plus petite salle (l'entrée la plus proche) est gardée.
+    """
+    key = (board.width, board.static, bytes(board.dynamic), board.moverIndex)
+    rooms = _goalRoomsCache.get(key)
+    if rooms is None:
+        static = board.static
+        width = board.width
+        steps = (1, -1, width, -width)
+        boxes = set(board.boxIndices())
+        smallest = {}  # objectifs de la salle -> (cases, entrée, case extérieure)
+        for entrance in range(len(static)):
+            if static[entrance] >= WALL:
+                continue
+            for step in steps:
+                outside = entrance + step
+                if static[outside] >= WALL:
+                    continue
+                cells = _regionWithout(static, steps, entrance, outside)
+                if cells is None or board.moverIndex in cells or cells & boxes:
+                    continue
+                goals = frozenset(index for index in cells if static[index] == GOAL)
+                if goals and (goals not in smallest or len(cells) < len(smallest[goals][0])):
+                    smallest[goals] = (cells, entrance, outside)
+        rooms = []
+        for goals, (cells, entrance, outside) in smallest.items():
+            fillOrder, routes = _fillOrder(static, steps, cells, entrance, outside, goals)
+            if fillOrder is not None:
+                rooms.append(GoalRoom(entrance, outside, frozenset(cells), fillOrder, routes))
+        _goalRoomsCache[key] = rooms
+    return rooms
+
+
+def _regionWithout(static, steps, entrance, outside):
+    """Cases praticables reliées à #entrance sans passer par #outside, None si #outside est touchée ailleurs."""
+    cells = {entrance}
+    stack = [entrance]
+    while stack:
+        index = stack.pop()
+        for step in steps:
+            neighbour = index + step
+            if neighbour == outside:
+                if index != entrance:
+                    return None  # une autre case de la zone touche la case extérieure
+            elif static[neighbour] < WALL and neighbour not in cells:
+                cells.add(neighbour)
+                stack.append(neighbour)
+    return cells
+
+
+def _fillOrder(static, steps, cells, entrance, outside, goals):
+    """
+    Ordre de remplissage de la salle et poussées de chaque étape, calculés à rebours : le dernier objectif
+    rempli est un objectif qu'une caisse peut atteindre depuis l'entrée, tous les autres étant occupés.
+    Retourne (None, None) si l'on ne trouve pas d'ordre.
+    """
+    remaining = set(goals)
+    fillOrder = []
+    routes = []
+    while remaining:
+        for goal in sorted(remaining):
+            route = _pushRoute(static, steps, cells, entrance, outside, goal, remaining - {goal})
+            if route is not None:
+                remaining.remove(goal)
+                fillOrder.append(goal)
+                routes.append(route)
+                break
+        else:
+            return None, None
+    fillOrder.reverse()
+    routes.reverse()
+    return tuple(fillOrder), tuple(routes)
+
+
+def _pushRoute(static, steps, cells, entrance, outside, goal, obstacles):
+    """
+    Poussées (le moins possible) d'une caisse de #entrance à #goal dans la salle #cells, le joueur partant
+    de #outside et les cases #obstacles étant occupées. Retourne un tuple de poussées, ou None.
+    """
+    def free(index):
+        return index in cells and index not in obstacles
+
+    start = (entrance, outside)
+    parents = {start: None}  # (caisse, joueur) -> (état précédent, poussée ou None)
+    layer = [start]
+    while layer:
+        # Marche du joueur : coût nul, on complète la couche avant les poussées
+        stack = list(layer)
+        while stack:
+            state = stack.pop()
+            box, player = state
+            for step in steps:
+                neighbour = player + step
+                if neighbour != box and (free(neighbour) or neighbour == outside):
+                    following = (box, neighbour)
+                    if following not in parents:
+                        parents[following] = (state, None)
+                        layer.append(following)
+                        stack.append(following)
+        nextLayer = []
+        for state in layer:
+            box, player = state
+            step = box - player
+            if step in steps and free(box + step):
+                following = (box + step, box)
+                if following not in parents:
+                    parents[following] = (state, (box, box + step))
+                    if box + step == goal:
+                        route = []
+                        while following is not None:
+                            previous = parents[following]
+                            if previous is None:
+                                break
+                            following, push = previous
+                            if push is not None:
+                                route.append(push)
+                        route.reverse()
+                        return tuple(route)
+                    nextLayer.append(following)
+        layer = nextLayer
+    return None
+
+
+def staticHash(board):
+    """Hash (hexadécimal) de la couche statique d'un plateau : identifie un niveau indépendamment des caisses."""
+    digest = hashlib.sha1(DISTANCES_VERSION)
+    digest.update(board.width.to_bytes(4, 'little'))
+    digest.update(board.static)
+    return digest.hexdigest()
+
+
+def goalDistances(board):
+    """
+    Distances en poussées de chaque case vers chaque objectif, en ignorant les autres caisses.
+    Retourne un dict objectif -> array('H') indexé par case (INFINITY si l'objectif est hors d'atteinte).
+    Les tables sont lues sur disque si elles y sont, calculées et enregistrées sinon.
+    """
+    key = (board.width, board.static)
+    distances = _goalDistancesCache.get(key)
+    if distances is None:
+        goals = sorted(board.goalIndices())
+        path = os.path.join(cacheDir, staticHash(board) + '.dist')
+        distances = _readDistances(path, goals, len(board.static))
+        if distances is None:
+            distances = {goal: pullDistances(board, goal) for goal in goals}
+            _writeDistances(path, goals, distances)
+        _goalDistancesCache[key] = distances
+    return distances
+
+
+def pullDistances(board, goal):
+    """
+    Distances en poussées de chaque case vers #goal, par un parcours en largeur "vectorisé" :
+    chaque couche du parcours est un entier dont le bit i représente la case i, et une couche
+    entière est tirée d'un pas dans chaque direction par un décalage et un ET avec un masque.
+    """
+    static = board.static
+    width = board.width
+    size = len(static)
+    floor = 0
+    for index, code in enumerate(static):
+        if code < WALL:
+            floor |= 1 << index
+    # pullable[step] : cases c d'où une caisse peut être poussée vers c + step (c et c - step praticables)
+    pullable = {}
+    for step in (1, -1, width, -width):
+        behind = floor << step if step > 0 else floor >> -step
+        pullable[step] = floor & behind
+    distances = array('H', [INFINITY]) * size
+    distances[goal] = 0
+    visited = frontier = 1 << goal
+    distance = 0
+    while frontier:
+        distance += 1
+        layer = 0
+        for step, mask in pullable.items():
+            # La caisse vient de index - step : décalage de la couche de -step
+            layer |= (frontier >> step if step > 0 else frontier << -step) & mask
+        frontier = layer & ~visited
+        visited |= frontier
+        bits = frontier
+        while bits:
+            low = bits & -bits
+            distances[low.bit_length() - 1] = distance
+            bits ^= low
+    return distances
+
+
+def pushDistances(board, source):
+    """
+    Distances en poussées d'une caisse partant de #source vers chaque case, en ignorant les autres
+    caisses (parcours "vectorisé" comme #pullDistances, dans le sens des poussées).
+    """
+    static = board.static
+    width = board.width
+    size = len(static)
+    floor = 0
+    for index, code in enumerate(static):
+        if code < WALL:
+            floor |= 1 << index
+    # pushable[step] : cases t où une caisse peut arriver par une poussée de pas step
+    # (t et la case du joueur t - 2 * step praticables)
+    pushable = {}
+    for step in (1, -1, width, -width):
+        player = floor << 2 * step if step > 0 else floor >> -2 * step
+        pushable[step] = floor & player
+    distances = array('H', [INFINITY]) * size
+    distances[source] = 0
+    visited = frontier = 1 << source
+    distance = 0
+    while frontier:
+        distance += 1
+        layer = 0
+        for step, mask in pushable.items():
+            layer |= (frontier << step if step > 0 else frontier >> -step) & mask
+        frontier = layer & ~visited
+        visited |= frontier
+        bits = frontier
+        while bits:
+            low = bits & -bits
+            distances[low.bit_length() - 1] = distance
+            bits ^= low
+    return distances
+
+
+def _readDistances(path, goals, size):
+    """Tables lues dans #path, ou None si le fichier est absent ou ne correspond pas au niveau."""
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    table = array('H')
+    if len(data) != table.itemsize * size * len(goals):
+        return None
+    table.frombytes(data)
+    return {goal: table[number * size:(number + 1) * size] for number, goal in enumerate(goals)}
+
+
+def _writeDistances(path, goals, distances):
+    """Enregistre les tables (dans l'ordre de #goals) ; un cache non enregistrable est simplement ignoré."""
+    table = array('H')
+    for goal in goals:
+        table.extend(distances[goal])
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = '%s.%d.tmp' % (path, os.getpid())
+        with open(temporary, 'wb') as file:
+            table.tofile(file)
+        os.replace(temporary, path)  # jamais de fichier à moitié écrit, même avec plusieurs processus
+    except OSError:
+        pass
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Résolution en lot d'une collection de niveaux, répartie sur tous les cœurs.
+
+Chaque niveau est résolu dans un processus du pool (concurrent.futures.ProcessPoolExecutor) avec
+un budget de temps (limite du solveur) et un budget de mémoire (limite d'espace d'adressage du
+processus, via resource.setrlimit quand le système le permet). Un niveau qui dépasse son budget de
+mémoire est marqué 'memory' sans interrompre le lot.
+À la fin, un tableau récapitule le statut, les poussées, les pas, les nœuds développés et la durée
+de chaque niveau, ainsi que le temps total et le gain par rapport à une exécution séquentielle.
+Les niveaux déjà dans la base de solutions (sokobanSolutions) ne sont pas résolus à nouveau : leur
+ligne reprend les statistiques enregistrées, marquée "(base)". Les nouvelles solutions y sont ajoutées.
+Avec --profile, les relevés de progression d'un niveau sont gardés par son processus et écrits dans le
+fichier quand le niveau est terminé (pas au fil de la recherche) : pour suivre un niveau long en
+direct, utiliser sokobanSolver --profile sur ce niveau.
+
+Usage :
+    python sokobanBatch.py                          # tous les niveaux de SokobanXSBLevels
+    python sokobanBatch.py --file levels.txt --time 30 --memory 1024
+    python sokobanBatch.py --jobs 4 1 2 3 10        # quelques niveaux sur 4 processus
+    python sokobanBatch.py --mode ida --table-memory 512 --memory 1024   # machines à mémoire réduite
+    python sokobanBatch.py --no-db                  # tout résoudre, sans consulter la base
+    python sokobanBatch.py --no-db --profile profil.jsonl   # relevés de progression (sokobanMetrics)
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import resource
+except ImportError:  # pas de limite de mémoire hors POSIX
+    resource = None
+
+from sokobanSolutions import DEFAULT_DATABASE, SolutionDB
+from sokobanSolver import DEFAULT_TABLE_MEMORY, SOLVERS, SolverResult, solve
+from sokobanXSBLevels import SokobanXSBLevels, readXsbLevels
+
+
+def limitMemory(megabytes):
+    """Limite l'espace d'adressage du processus courant à #megabytes Mo (sans effet si impossible)."""
+    if resource is None or megabytes is None:
+        return
+    limit = megabytes * 1024 * 1024
+    try:
+        hard = resource.getrlimit(resource.RLIMIT_AS)[1]
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def solveLevel(number, xsbMatrix, timeLimit, memoryLimit, maxNodes, deadlocks, matching, mode, tableMemory,
+               macros, profile=False):
+    """
+    Tâche d'un processus du pool : résout le niveau #number et retourne (number, SolverResult, relevés),
+    les relevés de progression (sokobanMetrics) n'étant collectés que si #profile est vrai. Ils ne
+    sont rendus qu'à la fin du niveau, avec le résultat.
+    """
+    limitMemory(memoryLimit)
+    records = []
+    start = time.perf_counter()
+    try:
+        result = solve(xsbMatrix, timeLimit, maxNodes, deadlocks, matching, mode, tableMemory, macros,
+                       onMetrics=records.append if profile else None)
+    except MemoryError:
+        result = SolverResult('memory', seconds=time.perf_counter() - start)
+    return number, result, records
+
+
+def solveAll(collection, numbers, jobs=None, timeLimit=60.0, memoryLimit=None, maxNodes=None,
+             deadlocks=True, matching=True, progress=None, mode='astar', tableMemory=DEFAULT_TABLE_MEMORY,
+             macros=False, database=None, onMetrics=None):
+    """
+    Résout les niveaux #numbers (à partir de 1) de #collection sur #jobs processus.
+    #progress(number, result) est appelé dans le processus principal à chaque niveau terminé, ainsi que
+    #onMetrics(number, relevé) pour chaque relevé de progression du niveau (tous à la fin du niveau).
+    Avec une SolutionDB #database, les niveaux déjà résolus sont lus dans la base et les nouvelles
+    solutions y sont enregistrées (par le processus principal seulement).
+    Retourne (dict numéro -> SolverResult, ensemble des numéros lus dans la base).
+    """
+    results = {}
+    cached = set()
+    toSolve = []
+    for number in numbers:
+        result = database.get(collection[number - 1]) if database is not None else None
+        if result is None:
+            toSolve.append(number)
+        else:
+            results[number] = result
+            cached.add(number)
+            if progress is not None:
+                progress(number, result)
+    if not toSolve:
+        return results, cached
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(solveLevel, number, collection[number - 1], timeLimit, memoryLimit,
+                                   maxNodes, deadlocks, matching, mode, tableMemory, macros, onMetrics is not None)
+                   for number in toSolve]
+        for future in as_completed(futures):
+            number, result, records = future.result()
+            results[number] = result
+            for record in records:
+                onMetrics(number, record)
+            if database is not None:
+                database.put(collection[number - 1], result, mode)
+            if progress is not None:
+                progress(number, result)
+    return results, cached
+
+
+def formatTable(results, cached=()):
+    """Tableau texte des résultats, trié par numéro de niveau (#cached : niveaux lus dans la base)."""
+    lines = [f"{'niveau':>6}  {'statut':<10} {'poussées':>8} {'pas':>7} {'nœuds':>9} {'secondes':>9}"]
+    for number in sorted(results):
+        result = results[number]
+        lines.append(f"{number:>6}  {result.status:<10} {result.pushes:>8} {result.moves:>7} "
+                     f"{result.nodes:>9} {result.seconds:>9.2f}" + ("  (base)" if number in cached else ""))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Résout une collection de niveaux de Sokoban en parallèle.")
+    parser.add_argument('levels', nargs='*', type=int, help="numéros de niveaux (à partir de 1), tous par défaut")
+    parser.add_argument('--file', help="collection de niveaux au format texte (ex. levels.txt)")
+    parser.add_argument('--jobs', type=int, default=None, help="nombre de processus (par défaut : un par cœur)")
+    parser.add_argument('--time', type=float, default=60.0, help="limite de temps par niveau, en secondes")
+    parser.add_argument('--memory', type=int, default=None, help="limite de mémoire par processus, en Mo")
+    parser.add_argument('--nodes', type=int, default=None, help="limite de nœuds par niveau")
+    parser.add_argument('--no-deadlocks', action='store_true', help="désactive les tests de gel et de PI-corral")
+    parser.add_argument('--nearest', action='store_true',
+                        help="heuristique de l'objectif le plus proche au lieu de l'affectation minimale")
+    parser.add_argument('--macros', action='store_true',
+                        help="macro-poussées (tunnels et salles d'objectifs) : plus rapide, mais la solution "
+                             "n'est plus garantie optimale en poussées")
+    parser.add_argument('--mode', choices=sorted(SOLVERS), default='astar',
+                        help="mode de recherche (voir sokobanSolver)")
+    parser.add_argument('--table-memory', type=int, default=DEFAULT_TABLE_MEMORY,
+                        help="taille de la table de transposition du mode ida, ou du tampon du mode external, "
+                             "en Mo")
+    parser.add_argument('--db', default=DEFAULT_DATABASE, help="base de solutions (SQLite)")
+    parser.add_argument('--no-db', action='store_true', help="ne consulte ni ne remplit la base de solutions")
+    parser.add_argument('--profile', metavar='FICHIER',
+                        help="écrit les relevés de progression (sokobanMetrics) au format JSON Lines, "
+                             "niveau par niveau quand chacun est terminé")
+    args = parser.parse_args()
+
+    collection = readXsbLevels(args.file) if args.file else SokobanXSBLevels
+    numbers = args.levels or range(1, len(collection) + 1)
+
+    def progress(number, result):
+        print(f"Niveau {number} : {result.status} ({result.seconds:.2f}s)", file=sys.stderr)
+
+    database = None if args.no_db else SolutionDB(args.db)
+    profile = open(args.profile, 'w') if args.profile else None
+
+    def onMetrics(number, record):
+        profile.write(json.dumps(dict(level=number, mode=args.mode, **record)) + '\n')
+
+    start = time.perf_counter()
+    results, cached = solveAll(collection, numbers, args.jobs, args.time, args.memory, args.nodes,
+                               not args.no_deadlocks, not args.nearest, progress, args.mode, args.table_memory,
+                               args.macros, database, onMetrics if profile is not None else None)
+    wallClock = time.perf_counter() - start
+    if database is not None:
+        if database.error is not None:
+            print(f"Base de solutions inutilisable ou incomplète : {database.error}", file=sys.stderr)
+        database.close()
+    if profile is not None:
+        profile.close()
+    print(formatTable(results, cached))
+    solved = sum(result.solved for result in results.values())
+    cpuSeconds = sum(result.seconds for number, result in results.items() if number not in cached)
+    print(f"{solved}/{len(numbers)} niveaux résolus en {wallClock:.2f}s, dont {len(cached)} lus dans la base "
+          f"({cpuSeconds:.2f}s de calcul, x{cpuSeconds / wallClock if wallClock else 0:.2f}, "
+          f"{args.jobs or os.cpu_count()} processus)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks du modèle Sokoban (sans Tkinter).
+
+Usage :
+    python sokobanBench.py
+"""
+import timeit
+
+from sokobanBoard import *
+
+
+def legacyPositionTowards(position, direction, offset):
+    """Ancienne version de Position.positionTowards (chaîne de if/elif, une Position créée par appel)."""
+    if direction == Direction.Up:
+        return Position(position.x, position.y - offset)
+    elif direction == Direction.Down:
+        return Position(position.x, position.y + offset)
+    elif direction == Direction.Left:
+        return Position(position.x - offset, position.y)
+    elif direction == Direction.Right:
+        return Position(position.x + offset, position.y)
+    else:
+        return Position(position.x, position.y)
+
+
+def benchPositionTowards(number=200000):
+    """
+    Compare le calcul de la case voisine :
+        - legacy : chaîne de if/elif et nouvelle Position à chaque appel
+        - table : Position.positionTowards (table d'offsets et positions partagées)
+        - index : index plat + offset du CompactBoard (aucun objet)
+    Retourne un dict nom -> secondes pour #number appels.
+    """
+    board = CompactBoard.fromXsb([['#'] * 12 for _ in range(12)])
+    position = Position(5, 5)
+    index = position.asIndexIn(board)
+    offsets = board.offsets
+    directions = [Direction.Up, Direction.Down, Direction.Left, Direction.Right]
+    timings = {
+        'legacy': timeit.timeit(lambda: [legacyPositionTowards(position, d, 1) for d in directions],
+                                number=number // 4),
+        'table': timeit.timeit(lambda: [position.positionTowards(d, 1) for d in directions],
+                               number=number // 4),
+        'index': timeit.timeit(lambda: [index + offsets[d] for d in directions],
+                               number=number // 4),
+    }
+    return timings
+
+
+def printTimings(title, timings, number):
+    print(title)
+    reference = max(timings.values())
+    for name, seconds in timings.items():
+        print(f"  {name:8s} {seconds * 1e9 / number:8.1f} ns/appel  x{reference / seconds:.2f}")
+
+
+if __name__ == "__main__":
+    printTimings("Position.positionTowards", benchPositionTowards(), 200000)
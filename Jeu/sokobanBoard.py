@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+Modèle compact d'un entrepôt Sokoban, indépendant de Tkinter.
+
+Le plateau est stocké dans deux tableaux d'octets de même taille (une case = un octet) :
+    - la couche statique (#static) : FLOOR, GOAL, WALL ou VOID, immuable après le chargement
+    - la couche dynamique (#dynamic) : EMPTY, BOX ou MOVER
+Une case est repérée par un index plat : index = (y + 1) * width + (x + 1).
+Le plateau est entouré d'une bordure de VOID, ce qui évite tout test de bornes :
+les voisins d'une case jouable sont toujours des index valides (index + offset).
+"""
+from enum import Enum
+import random
+
+"""
+Direction :
+    Utile pour gérer le calcul des positions pour les mouvements
+"""
+
+
+class Direction(Enum):
+    Up = 1
+    Down = 2
+    Left = 3
+    Right = 4
+
+
+# Décalage (dx, dy) d'une case pour chaque direction, calculé une fois pour toutes
+DIRECTION_OFFSETS = {
+    Direction.Up: (0, -1),
+    Direction.Down: (0, 1),
+    Direction.Left: (-1, 0),
+    Direction.Right: (1, 0),
+}
+
+
+"""
+Position :
+    - stockage de coordonnées x et y,
+    - vérification de x et y par rapport à une matrice
+    - calcule de position relative à partir d'un offset (un décalage) et une direction
+    Une Position est une valeur immuable et hashable (utilisable comme clé de dict ou dans un set).
+    Position.at(x, y) retourne une instance partagée : les boucles chaudes ne créent pas d'objet.
+    Seules les positions du plateau courant sont partagées (#internFor, appelé au chargement d'un
+    niveau, vide le cache) : le cache ne grossit pas d'un niveau à l'autre.
+    Pour les calculs intensifs, préférer les index plats (#asIndexIn, #indexTowardsIn).
+"""
+class Position(object):
+    __slots__ = ('x', 'y')
+    _interned = {}  # (x, y) -> Position
+    _bounds = (64, 64)  # (largeur, hauteur) du plateau courant : seules ces positions sont partagées
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    @classmethod
+    def at(cls, x, y):
+        """Retourne la Position de coordonnées (x, y), partagée si elle est sur le plateau courant."""
+        key = (x, y)
+        position = cls._interned.get(key)
+        if position is None:
+            position = cls(x, y)
+            width, height = cls._bounds
+            if 0 <= x < width and 0 <= y < height:
+                cls._interned[key] = position
+        return position
+
+    @classmethod
+    def internFor(cls, width, height):
+        """Vide le cache des positions partagées et le limite à un plateau de #width x #height cases."""
+        cls._interned.clear()
+        cls._bounds = (width, height)
+
+    def __str__(self):
+        return 'Position(' + str(self.x) + ',' + str(self.y) + str(')')
+
+    __repr__ = __str__
+
+    def __eq__(self, other):
+        return isinstance(other, Position) and self.x == other.x and self.y == other.y
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def getX(self):
+        return self.x
+
+    def getY(self):
+        return self.y
+
+    # retoune la position vers la direction #direction en tenant compte de l'offset
+    #   Position(3,4).positionTowards(Direction.Right, 2) == Position(5,4)
+    def positionTowards(self, direction, offset):
+        dx, dy = DIRECTION_OFFSETS[direction]
+        return Position.at(self.x + dx * offset, self.y + dy * offset)
+
+    # Retourne True si les coordonnées sont valides dans le wharehouse
+    def isValidInWharehouse(self, wharehouse):
+        return wharehouse.isPositionValid(self)
+
+    # Convertit le receveur en une position correspondante dans un Canvas
+    def asCanvasPositionIn(self, elem):
+        lx = self.getX() * elem.getWidth()
+        ly = self.getY() * elem.getHeight()
+        return Position(lx, ly)
+
+    # Convertit le receveur en index plat dans un CompactBoard
+    def asIndexIn(self, board):
+        return board.index(self.x, self.y)
+
+    # Index plat de la case voisine vers #direction, sans créer de Position
+    def indexTowardsIn(self, board, direction, offset=1):
+        return board.index(self.x, self.y) + board.offsets[direction] * offset
+
+    # Retourne la Position partagée correspondant à l'index plat #index d'un CompactBoard
+    @classmethod
+    def fromIndexIn(cls, board, index):
+        x, y = board.coordinates(index)
+        return cls.at(x, y)
+
+
+# Codes de la couche statique : une case est praticable si son code est < WALL
+FLOOR = 0
+GOAL = 1
+WALL = 2
+VOID = 3  # hors du niveau (bordure, fin des lignes courtes)
+
+# Codes de la couche dynamique
+EMPTY = 0
+BOX = 1
+MOVER = 2
+
+# Résultats de CompactBoard.move
+BLOCKED = 0
+MOVED = 1
+PUSHED = 2
+
+
+"""
+CompactBoard : plateau compact (tableaux d'octets + largeur).
+    Toutes les opérations d'un pas de jeu sont des opérations sur des entiers.
+    La couche statique est un bytes partagé entre les copies : copier un plateau
+    ne duplique que la couche dynamique.
+"""
+class CompactBoard(object):
+    __slots__ = ('width', 'height', 'static', 'dynamic', 'moverIndex', 'offsets')
+
+    def __init__(self, width, height, static, dynamic, moverIndex):
+        self.width = width  # largeur, bordure comprise
+        self.height = height  # hauteur, bordure comprise
+        self.static = static  # bytes : FLOOR, GOAL, WALL, VOID
+        self.dynamic = dynamic  # bytearray : EMPTY, BOX, MOVER
+        self.moverIndex = moverIndex  # index du joueur, -1 s'il n'y en a pas
+        self.offsets = {Direction.Up: -width, Direction.Down: width,
+                        Direction.Left: -1, Direction.Right: 1}
+
+    @classmethod
+    def fromXsb(cls, xsbMatrix):
+        """
+        Construit un plateau à partir d'une matrice xsb.
+        Legend :
+            '#' = mur, '$' = caisse, '.' = objectif, '*' = caisse sur objectif,
+            '@' = joueur, '+' = joueur sur objectif, '-' ou ' ' = sol
+        Les caractères inconnus sont considérés comme du sol.
+        """
+        nbcolumns = max(len(line) for line in xsbMatrix) if xsbMatrix else 0
+        width = nbcolumns + 2
+        height = len(xsbMatrix) + 2
+        static = bytearray([VOID]) * (width * height)
+        dynamic = bytearray(width * height)
+        moverIndex = -1
+        for y, line in enumerate(xsbMatrix):
+            index = (y + 1) * width + 1
+            for char in line:
+                if char == '#':
+                    static[index] = WALL
+                elif char in '.+*':
+                    static[index] = GOAL
+                else:
+                    static[index] = FLOOR
+                if char in '@+':
+                    dynamic[index] = MOVER
+                    moverIndex = index
+                elif char in '$*':
+                    dynamic[index] = BOX
+                index += 1
+        return cls(width, height, bytes(static), dynamic, moverIndex)
+
+    def copy(self):
+        """Retourne une copie du plateau (la couche statique est partagée)."""
+        return CompactBoard(self.width, self.height, self.static, bytearray(self.dynamic), self.moverIndex)
+
+    def index(self, x, y):
+        """Index plat de la case (x, y) du niveau."""
+        return (y + 1) * self.width + x + 1
+
+    def coordinates(self, index):
+        """Coordonnées (x, y) dans le niveau de la case #index."""
+        y, x = divmod(index, self.width)
+        return x - 1, y - 1
+
+    def isInside(self, index):
+        """Vrai si #index est une case du niveau (ni bordure, ni fin de ligne courte)."""
+        return 0 <= index < len(self.static) and self.static[index] != VOID
+
+    def isWall(self, index):
+        return self.static[index] == WALL
+
+    def isGoal(self, index):
+        return self.static[index] == GOAL
+
+    def hasBox(self, index):
+        return self.dynamic[index] == BOX
+
+    def isFree(self, index):
+        """Vrai si la case est praticable (sol ou objectif) et inoccupée."""
+        return self.static[index] < WALL and self.dynamic[index] == EMPTY
+
+    def canMove(self, direction):
+        """Vrai si le joueur peut aller vers #direction (en poussant au plus une caisse)."""
+        offset = self.offsets[direction]
+        nextIndex = self.moverIndex + offset
+        if self.static[nextIndex] >= WALL:
+            return False
+        if self.dynamic[nextIndex] == BOX:
+            return self.isFree(nextIndex + offset)
+        return True
+
+    def moveBox(self, fromIndex, toIndex):
+        """Déplace la caisse de #fromIndex vers #toIndex (sans vérification)."""
+        self.dynamic[fromIndex] = EMPTY
+        self.dynamic[toIndex] = BOX
+
+    def moveMover(self, toIndex):
+        """Déplace le joueur vers #toIndex (sans vérification)."""
+        self.dynamic[self.moverIndex] = EMPTY
+        self.dynamic[toIndex] = MOVER
+        self.moverIndex = toIndex
+
+    def move(self, direction):
+        """Joue un pas vers #direction : retourne BLOCKED, MOVED ou PUSHED."""
+        if not self.canMove(direction):
+            return BLOCKED
+        offset = self.offsets[direction]
+        nextIndex = self.moverIndex + offset
+        result = MOVED
+        if self.dynamic[nextIndex] == BOX:
+            self.moveBox(nextIndex, nextIndex + offset)
+            result = PUSHED
+        self.moveMover(nextIndex)
+        return result
+
+    def reachable(self, start=None):
+        """
+        Cases accessibles au joueur depuis #start (par défaut sa position) sans pousser de caisse.
+        Retourne un bytearray : 1 pour une case accessible, 0 sinon.
+        """
+        if start is None:
+            start = self.moverIndex
+        static = self.static
+        dynamic = self.dynamic
+        marks = bytearray(len(static))
+        marks[start] = 1
+        stack = [start]
+        steps = (1, -1, self.width, -self.width)
+        while stack:
+            index = stack.pop()
+            for step in steps:
+                neighbour = index + step
+                if not marks[neighbour] and static[neighbour] < WALL and dynamic[neighbour] != BOX:
+                    marks[neighbour] = 1
+                    stack.append(neighbour)
+        return marks
+
+    def normalizedMoverIndex(self):
+        """Plus petit index accessible au joueur : identifie sa zone quelle que soit sa case exacte."""
+        return self.reachable().index(1)
+
+    def boxIndices(self):
+        return [index for index, code in enumerate(self.dynamic) if code == BOX]
+
+    def goalIndices(self):
+        return [index for index, code in enumerate(self.static) if code == GOAL]
+
+    def boxesOnGoal(self):
+        return sum(1 for index in self.boxIndices() if self.static[index] == GOAL)
+
+    def isSolved(self):
+        """Vrai si toutes les caisses sont sur un objectif."""
+        return all(self.static[index] == GOAL for index in self.boxIndices())
+
+    def xsbChar(self, index):
+        static = self.static[index]
+        dynamic = self.dynamic[index]
+        if static == WALL:
+            return '#'
+        if dynamic == MOVER:
+            return '+' if static == GOAL else '@'
+        if dynamic == BOX:
+            return '*' if static == GOAL else '$'
+        return '.' if static == GOAL else ' '
+
+    def xsbMatrix(self):
+        """Retourne la matrice xsb du plateau (sans la bordure ni les cases hors niveau en fin de ligne)."""
+        matrix = []
+        for y in range(1, self.height - 1):
+            start = y * self.width + 1
+            end = start + self.width - 2
+            while end > start and self.static[end - 1] == VOID:
+                end -= 1
+            matrix.append([self.xsbChar(index) for index in range(start, end)])
+        return matrix
+
+
+"""
+ZobristTable : clés aléatoires de 64 bits par case, pour hacher un état en temps constant.
+    hash(état) = XOR des clés des caisses ^ clé de la zone du joueur (#normalizedMoverIndex).
+    Déplacer une caisse revient à deux XOR ; un pas sans poussée ne change pas la zone du joueur,
+    donc ne change pas le hash.
+    Les clés sont tirées avec une graine fixe : le même état a le même hash dans tous les processus.
+"""
+class ZobristTable(object):
+    __slots__ = ('boxKeys', 'moverKeys')
+    _tables = {}  # taille du plateau -> ZobristTable
+
+    def __init__(self, size, seed=0x50C0BA):
+        generator = random.Random(seed)
+        self.boxKeys = [generator.getrandbits(64) for _ in range(size)]
+        self.moverKeys = [generator.getrandbits(64) for _ in range(size)]
+
+    @classmethod
+    def forSize(cls, size):
+        """Retourne la table partagée pour un plateau de #size cases."""
+        table = cls._tables.get(size)
+        if table is None:
+            table = cls._tables[size] = cls(size)
+        return table
+
+    def boxesHash(self, boxIndices):
+        value = 0
+        for index in boxIndices:
+            value ^= self.boxKeys[index]
+        return value
+
+    def hash(self, board):
+        """Hash complet (caisses et zone du joueur) d'un plateau, calculé sans incrément."""
+        return self.boxesHash(board.boxIndices()) ^ self.moverKeys[board.normalizedMoverIndex()]
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Détection dynamique des impasses pour l'élagage de la recherche (voir sokobanSolver).
+
+Les deux tests sont incrémentaux : ils ne regardent que le voisinage de la dernière caisse poussée.
+    - Gel ("freeze") : après une poussée, on cherche le plus grand groupe de caisses autour de la
+      caisse poussée dont aucune ne peut plus bouger (bloquée sur les deux axes par un mur, une
+      autre caisse gelée ou deux cases mortes). Si une caisse gelée n'est pas sur un objectif,
+      l'état est une impasse.
+    - PI-corral : une zone inaccessible au joueur (corral) fermée par des caisses qui ne peuvent
+      être poussées que vers l'intérieur (I) et qui peuvent toutes l'être immédiatement (P) ; un
+      pourtour dont une caisse n'est pas à portée du joueur n'est pas un PI-corral.
+      Il suffit alors de ne considérer que les poussées de ces caisses : les autres sont élaguées.
+"""
+from sokobanBoard import *
+
+
+"""
+DeadlockDetector : tests d'impasse pour un SokobanProblem.
+    #prunedFreeze compte les états éliminés par le test de gel,
+    #prunedCorral compte les poussées éliminées par la restriction aux PI-corrals.
+"""
+class DeadlockDetector(object):
+    def __init__(self, problem):
+        self.problem = problem
+        self.static = problem.static
+        self.dead = problem.dead
+        self.goals = problem.goals
+        self.width = problem.width
+        self.prunedFreeze = 0
+        self.prunedCorral = 0
+
+    def isFrozenDeadlock(self, boxes, pushed):
+        """Vrai si la caisse #pushed appartient à un groupe de caisses gelées dont une n'est pas sur un objectif."""
+        static = self.static
+        dead = self.dead
+        width = self.width
+        # Groupe des caisses reliées à la caisse poussée
+        cluster = {pushed}
+        stack = [pushed]
+        while stack:
+            index = stack.pop()
+            for step in (1, -1, width, -width):
+                neighbour = index + step
+                if neighbour in boxes and neighbour not in cluster:
+                    cluster.add(neighbour)
+                    stack.append(neighbour)
+        # Plus grand point fixe : on suppose tout le groupe gelé, puis on retire les caisses qui peuvent bouger
+        frozen = set(cluster)
+        changed = True
+        while changed:
+            changed = False
+            for index in list(frozen):
+                for step in (1, width):
+                    before = index - step
+                    after = index + step
+                    blocked = (static[before] == WALL or static[after] == WALL or
+                               (dead[before] and dead[after]) or before in frozen or after in frozen)
+                    if not blocked:
+                        frozen.discard(index)
+                        changed = True
+                        break
+        if pushed not in frozen:
+            return False
+        goals = self.goals
+        if any(index not in goals for index in frozen):
+            self.prunedFreeze += 1
+            return True
+        return False
+
+    def corralPushes(self, boxes, marks, pushed, pushes):
+        """
+        Restreint #pushes (poussées légales de l'état) aux caisses d'un PI-corral touchant la caisse #pushed.
+        Retourne la liste restreinte, ou #pushes si aucun PI-corral n'est trouvé.
+        """
+        static = self.static
+        width = self.width
+        steps = (1, -1, width, -width)
+        best = None
+        seen = set()
+        for step in steps:
+            seed = pushed + step
+            if marks[seed] or static[seed] >= WALL or seed in boxes or seed in seen:
+                continue
+            # Zone du corral : cases praticables inaccessibles, séparées du joueur par des caisses
+            area = {seed}
+            stack = [seed]
+            fence = set()  # caisses touchant le corral
+            while stack:
+                index = stack.pop()
+                for step2 in steps:
+                    neighbour = index + step2
+                    if neighbour in boxes:
+                        fence.add(neighbour)
+                    elif static[neighbour] < WALL and neighbour not in area:
+                        area.add(neighbour)
+                        stack.append(neighbour)
+            seen |= area
+            # Barrière : caisses du pourtour que le joueur peut atteindre
+            barrier = {box for box in fence if any(marks[box + step2] for step2 in steps)}
+            restricted = self.piCorralPushes(boxes, area, fence, barrier, pushes)
+            if restricted is not None and (best is None or len(restricted) < len(best)):
+                best = restricted
+        if best is None:
+            return pushes
+        self.prunedCorral += len(pushes) - len(best)
+        return best
+
+    def piCorralPushes(self, boxes, area, fence, barrier, pushes):
+        """Poussées des caisses de la barrière si le corral #area est un PI-corral, None sinon."""
+        goals = self.goals
+        # Un corral déjà rangé (caisses et objectifs appariés) n'impose rien
+        if all(index in goals for index in fence) and not any(index in goals for index in area):
+            return None
+        if barrier != fence:
+            return None  # une caisse du pourtour est hors de portée du joueur : P n'est pas vérifiable
+        barrierPushes = [push for push in pushes if push[0] in barrier]
+        pushable = set()
+        for box, target in barrierPushes:
+            if target not in area:
+                return None  # I : une caisse de la barrière peut sortir du corral
+            pushable.add(box)
+        if len(pushable) != len(barrier):
+            return None  # P : le joueur ne peut pas encore pousser toutes les caisses de la barrière
+        return barrierPushes
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur de jeu Sokoban sans affichage.
+
+GameState applique les règles du jeu (mêmes règles que l'ancien Mover.canMove / Mover.moveTowards)
+sur un CompactBoard construit à partir d'une matrice xsb (format SokobanXSBLevels).
+L'affichage Tk n'est qu'un observateur : il reçoit les déplacements du joueur et des caisses
+et met à jour ses items de canvas. Sans observateur, le moteur tourne sans Tkinter
+(bots, rejeux, solveurs, tests).
+
+Les solutions sont écrites au format LURD : une lettre par pas, en minuscule pour un simple
+déplacement et en majuscule pour une poussée (ex. "llUrD").
+"""
+from sokobanBoard import *
+
+# Correspondance entre lettres LURD et directions
+LURD_DIRECTIONS = {
+    'u': Direction.Up, 'd': Direction.Down, 'l': Direction.Left, 'r': Direction.Right,
+    'U': Direction.Up, 'D': Direction.Down, 'L': Direction.Left, 'R': Direction.Right,
+}
+DIRECTION_LURD = {Direction.Up: 'u', Direction.Down: 'd', Direction.Left: 'l', Direction.Right: 'r'}
+
+
+# Codage d'un pas dans l'historique : un octet = code de direction | PUSH_FLAG si une caisse a été poussée
+DIRECTION_CODES = {Direction.Up: 0, Direction.Down: 1, Direction.Left: 2, Direction.Right: 3}
+CODE_DIRECTIONS = (Direction.Up, Direction.Down, Direction.Left, Direction.Right)
+OPPOSITE_DIRECTIONS = {Direction.Up: Direction.Down, Direction.Down: Direction.Up,
+                       Direction.Left: Direction.Right, Direction.Right: Direction.Left}
+PUSH_FLAG = 4
+
+
+def lurdChar(direction, pushed):
+    """Lettre LURD d'un pas vers #direction (majuscule si une caisse a été poussée)."""
+    char = DIRECTION_LURD[direction]
+    return char.upper() if pushed else char
+
+
+"""
+GameState : état d'une partie, sans affichage.
+    Les observateurs (#addObserver) doivent définir :
+        - boxMoved(fromIndex, toIndex, direction) : une caisse a changé de case
+        - moverMoved(fromIndex, toIndex, direction) : le joueur a changé de case
+    Pour un pas joué, boxMoved est notifié avant moverMoved (la caisse libère la case du joueur) ;
+    pour un pas annulé, moverMoved est notifié avant boxMoved (le joueur libère la case de la caisse).
+    L'historique (#history, #redoHistory) stocke un octet par pas : annuler ou refaire 10 000 pas
+    ne coûte que 10 000 octets, sans aucune copie du plateau.
+    #stateHash est un hash de Zobrist (caisses + zone du joueur) : la partie caisses est mise à jour
+    par deux XOR à chaque poussée, la zone du joueur n'est recalculée qu'à la demande après une poussée.
+"""
+class GameState(object):
+    def __init__(self, xsbMatrix):
+        self.board = CompactBoard.fromXsb(xsbMatrix)
+        self.boxCount = len(self.board.boxIndices())
+        self.boxesOnGoal = self.board.boxesOnGoal()  # tenu à jour à chaque poussée
+        self.moves = 0  # nombre de pas joués
+        self.pushes = 0  # nombre de poussées
+        self.zobrist = ZobristTable.forSize(len(self.board.static))
+        self.boxesHash = self.zobrist.boxesHash(self.board.boxIndices())  # XOR des clés des caisses
+        self.regionIndex = -1  # zone normalisée du joueur, -1 si à recalculer
+        self.history = bytearray()  # pas joués, pour #undo
+        self.redoHistory = bytearray()  # pas annulés, pour #redo
+        self.observers = []
+
+    def addObserver(self, observer):
+        self.observers.append(observer)
+
+    def removeObserver(self, observer):
+        self.observers.remove(observer)
+
+    def canMove(self, direction):
+        return self.board.canMove(direction)
+
+    def move(self, direction):
+        """Joue un pas vers #direction : retourne BLOCKED, MOVED ou PUSHED."""
+        result = self.step(direction)
+        if result:
+            self.redoHistory.clear()  # un nouveau pas invalide les pas annulés
+        return result
+
+    def step(self, direction):
+        """Joue un pas et l'ajoute à l'historique, sans toucher aux pas annulés."""
+        board = self.board
+        offset = board.offsets[direction]
+        fromIndex = board.moverIndex
+        nextIndex = fromIndex + offset
+        if board.static[nextIndex] >= WALL:
+            return BLOCKED
+        result = MOVED
+        if board.dynamic[nextIndex] == BOX:
+            boxIndex = nextIndex + offset
+            if not board.isFree(boxIndex):
+                return BLOCKED
+            self.moveBox(nextIndex, boxIndex, direction)
+            self.pushes += 1
+            result = PUSHED
+        board.moveMover(nextIndex)
+        self.moves += 1
+        self.history.append(DIRECTION_CODES[direction] | (PUSH_FLAG if result == PUSHED else 0))
+        for observer in self.observers:
+            observer.moverMoved(fromIndex, nextIndex, direction)
+        return result
+
+    def undo(self):
+        """Annule le dernier pas ; retourne False s'il n'y a rien à annuler."""
+        if not self.history:
+            return False
+        code = self.history.pop()
+        direction = CODE_DIRECTIONS[code & 3]
+        backwards = OPPOSITE_DIRECTIONS[direction]
+        board = self.board
+        offset = board.offsets[direction]
+        moverIndex = board.moverIndex
+        board.moveMover(moverIndex - offset)
+        self.moves -= 1
+        for observer in self.observers:
+            observer.moverMoved(moverIndex, moverIndex - offset, backwards)
+        if code & PUSH_FLAG:
+            # La caisse poussée est ramenée sur la case que le joueur vient de quitter
+            self.moveBox(moverIndex + offset, moverIndex, backwards)
+            self.pushes -= 1
+        self.redoHistory.append(code)
+        return True
+
+    def redo(self):
+        """Rejoue le dernier pas annulé ; retourne False s'il n'y a rien à refaire."""
+        if not self.redoHistory:
+            return False
+        return bool(self.step(CODE_DIRECTIONS[self.redoHistory.pop() & 3]))
+
+    def moveBox(self, fromIndex, toIndex, direction):
+        """Déplace une caisse et tient à jour le nombre de caisses sur un objectif."""
+        board = self.board
+        board.moveBox(fromIndex, toIndex)
+        self.boxesOnGoal += (board.static[toIndex] == GOAL) - (board.static[fromIndex] == GOAL)
+        self.boxesHash ^= self.zobrist.boxKeys[fromIndex] ^ self.zobrist.boxKeys[toIndex]
+        self.regionIndex = -1  # la zone accessible au joueur a pu changer
+        for observer in self.observers:
+            observer.boxMoved(fromIndex, toIndex, direction)
+
+    def stateHash(self):
+        """Hash de Zobrist de l'état (positions des caisses et zone accessible au joueur)."""
+        if self.regionIndex < 0:
+            self.regionIndex = self.board.normalizedMoverIndex()
+        return self.boxesHash ^ self.zobrist.moverKeys[self.regionIndex]
+
+    def playLurd(self, lurd):
+        """Rejoue une suite de pas LURD ; retourne le nombre de pas effectivement joués."""
+        played = 0
+        for char in lurd:
+            direction = LURD_DIRECTIONS.get(char)
+            if direction is not None and self.move(direction):
+                played += 1
+        return played
+
+    def isSolved(self):
+        """Vrai si toutes les caisses sont sur un objectif (en temps constant)."""
+        return self.boxesOnGoal == self.boxCount
+
+    def xsbMatrix(self):
+        return self.board.xsbMatrix()
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Recherche en largeur en mémoire externe, optimale en nombre de poussées, pour les niveaux dont
+l'espace d'états ne tient pas en mémoire.
+
+Les états sont parcourus par couches (une couche par nombre de poussées). Un état est codé sur un
+nombre fixe d'octets (cases des caisses triées, puis zone normalisée du joueur, en 16 bits gros-boutiste),
+si bien que l'ordre des octets est un ordre total sur les états. Toutes les couches et l'ensemble
+des états déjà vus sont des fichiers triés, sans doublon, compressés par blocs (zlib), sur le disque :
+    1. les enfants de la couche d sont générés sans consulter les états déjà vus ; quand le tampon de
+       #bufferMemory Mo est plein, il est trié, dédoublonné et écrit sur le disque (un "run") ;
+    2. détection différée des doublons : la fusion des runs, dédoublonnée, privée des états déjà vus
+       (fusion avec le fichier trié des états vus), donne la couche d + 1 ;
+    3. le fichier des états vus est remplacé par sa fusion avec la nouvelle couche.
+La mémoire utilisée est bornée par le tampon, plus un bloc par fichier fusionné. Les poussées étant
+irréversibles, un doublon peut venir de n'importe quelle couche précédente, d'où la fusion avec
+l'ensemble des états vus et non avec les deux dernières couches seulement.
+Sans pointeur vers les parents, la solution est reconstruite à la fin en remontant les couches :
+dans la couche d - 1, on cherche un état dont un enfant est l'état retenu dans la couche d.
+Seuls les tests de gel élaguent les poussées : les PI-corrals dépendent de la dernière poussée,
+qui ne fait pas partie de l'état. Les macro-poussées sont désactivées (optimalité en poussées).
+Les octets lus et écrits (compressés et non compressés) et le temps passé en entrées/sorties sont
+relevés dans #ExternalSolver.disk.
+
+C'est le mode 'external' de sokobanSolver.solve (et des options --mode de sokobanSolver et
+sokobanBatch, avec --table-memory pour la taille du tampon) ; la ligne de commande de ce module donne
+en plus le détail des entrées/sorties et permet de choisir le dossier de travail.
+
+Usage :
+    python sokobanExternal.py --file levels.txt 4
+    python sokobanExternal.py --memory 16 --work-dir /data/sokoban 12
+    python sokobanExternal.py --profile profil.jsonl 12     # relevés de progression (sokobanMetrics)
+"""
+import argparse
+import heapq
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+
+from sokobanAnalyse import INFINITY, cacheDir
+from sokobanMetrics import SolverMetrics
+from sokobanSolver import AStarSolver, SokobanProblem
+from sokobanXSBLevels import SokobanXSBLevels, readXsbLevels
+
+# Taille par défaut du tampon des enfants, en Mo
+DEFAULT_BUFFER_MEMORY = 64
+# Octets occupés en mémoire par un état du tampon, en plus de son codage (objet bytes et liste)
+BUFFER_ENTRY_OVERHEAD = 48
+# Taille des blocs lus et écrits, en octets non compressés
+BLOCK_SIZE = 1 << 16
+COMPRESSION_LEVEL = 1
+# Dossier par défaut des fichiers de travail (supprimés à la fin de la recherche)
+DEFAULT_WORK_DIR = os.path.join(cacheDir, 'external')
+
+
+def unique(records):
+    """États d'un flux trié, sans doublon."""
+    previous = None
+    for record in records:
+        if record != previous:
+            yield record
+            previous = record
+
+
+def difference(records, excluded):
+    """États du flux trié #records absents du flux trié #excluded."""
+    excluded = iter(excluded)
+    current = next(excluded, None)
+    for record in records:
+        while current is not None and current < record:
+            current = next(excluded, None)
+        if record != current:
+            yield record
+
+
+"""
+DiskStore : fichiers d'états de taille fixe (#recordSize octets) dans le dossier #directory.
+    Un fichier est une suite de blocs compressés, chacun précédé de sa taille (4 octets).
+    Compteurs : #files (fichiers écrits), #bytesWritten et #bytesRead (octets compressés sur le disque),
+    #rawWritten et #rawRead (octets d'états), #seconds (lecture, écriture et (dé)compression).
+"""
+class DiskStore(object):
+    def __init__(self, directory, recordSize):
+        self.directory = directory
+        self.recordSize = recordSize
+        self.files = 0
+        self.bytesWritten = 0
+        self.bytesRead = 0
+        self.rawWritten = 0
+        self.rawRead = 0
+        self.seconds = 0.0
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write(self, name, records):
+        """Écrit le flux d'états #records (trié, sans doublon) dans le fichier #name ; retourne leur nombre."""
+        perBlock = max(1, BLOCK_SIZE // self.recordSize)
+        count = 0
+        block = []
+        with open(self.path(name), 'wb') as stream:
+            for record in records:
+                block.append(record)
+                if len(block) == perBlock:
+                    self.writeBlock(stream, block)
+                    count += len(block)
+                    block = []
+            if block:
+                self.writeBlock(stream, block)
+                count += len(block)
+        self.files += 1
+        return count
+
+    def writeBlock(self, stream, block):
+        start = time.perf_counter()
+        raw = b''.join(block)
+        data = zlib.compress(raw, COMPRESSION_LEVEL)
+        stream.write(len(data).to_bytes(4, 'little'))
+        stream.write(data)
+        self.rawWritten += len(raw)
+        self.bytesWritten += len(data) + 4
+        self.seconds += time.perf_counter() - start
+
+    def read(self, name):
+        """Générateur des états du fichier #name, dans l'ordre."""
+        recordSize = self.recordSize
+        with open(self.path(name), 'rb') as stream:
+            while True:
+                start = time.perf_counter()
+                header = stream.read(4)
+                if not header:
+                    self.seconds += time.perf_counter() - start
+                    return
+                size = int.from_bytes(header, 'little')
+                raw = zlib.decompress(stream.read(size))
+                self.bytesRead += size + 4
+                self.rawRead += len(raw)
+                self.seconds += time.perf_counter() - start
+                for offset in range(0, len(raw), recordSize):
+                    yield raw[offset:offset + recordSize]
+
+    def remove(self, name):
+        os.remove(self.path(name))
+
+    def __str__(self):
+        megabyte = 1024 * 1024
+        return (f"écrits={self.bytesWritten / megabyte:.1f}Mo ({self.rawWritten / megabyte:.1f}Mo d'états) "
+                f"lus={self.bytesRead / megabyte:.1f}Mo ({self.rawRead / megabyte:.1f}Mo d'états) "
+                f"fichiers={self.files} temps={self.seconds:.2f}s")
+
+
+"""
+ExternalSolver : recherche en largeur sur les poussées, couches et états vus sur le disque.
+    #bufferMemory : taille du tampon des enfants, en Mo ; #workDir : dossier des fichiers de travail.
+    Après #solve, #disk donne les entrées/sorties et #peakLayer le nombre d'états de la plus grande couche.
+"""
+class ExternalSolver(object):
+    def __init__(self, problem, timeLimit=None, maxNodes=None, deadlocks=True, matching=True,
+                 bufferMemory=DEFAULT_BUFFER_MEMORY, workDir=None, metrics=None):
+        self.problem = problem
+        self.timeLimit = timeLimit  # en secondes, None : pas de limite
+        self.maxNodes = maxNodes  # None : pas de limite
+        self.metrics = metrics
+        self.search = AStarSolver(problem, deadlocks=deadlocks, matching=matching, macros=False, metrics=metrics)
+        self.codec = struct.Struct(f'>{len(problem.startBoxes) + 1}H')
+        self.bufferStates = max(1, bufferMemory * 1024 * 1024 // (self.codec.size + BUFFER_ENTRY_OVERHEAD))
+        self.workDir = workDir or DEFAULT_WORK_DIR
+        self.disk = None
+        self.peakLayer = 0
+
+    def encode(self, boxes, region):
+        return self.codec.pack(*sorted(boxes), region)
+
+    def decode(self, record):
+        """(caisses, case de la zone du joueur) d'un état codé."""
+        values = self.codec.unpack(record)
+        return frozenset(values[:-1]), values[-1]
+
+    def expand(self, record):
+        """Enfants non élagués d'un état codé : liste de (poussée, caisses de l'enfant, enfant codé)."""
+        problem = self.problem
+        boxes, mover = self.decode(record)
+        marks, _ = problem.reach(boxes, mover)
+        children = []
+        for _, _, _, _, childBoxes, childMover, push in self.search.children(boxes, marks, None, 0):
+            _, region = problem.reach(childBoxes, childMover)
+            children.append((push, childBoxes, self.encode(childBoxes, region)))
+        return children
+
+    def solve(self):
+        problem = self.problem
+        search = self.search
+        start = time.perf_counter()
+        if search.heuristic(problem.startBoxes) >= INFINITY:
+            return search.result('unsolvable', seconds=time.perf_counter() - start)
+        _, region = problem.reach(problem.startBoxes, problem.startMover)
+        if problem.isSolved(problem.startBoxes):
+            return search.result('solved', '', seconds=time.perf_counter() - start)
+        os.makedirs(self.workDir, exist_ok=True)
+        directory = tempfile.mkdtemp(prefix='bfs-', dir=self.workDir)
+        self.disk = DiskStore(directory, self.codec.size)
+        try:
+            status, goal, depth, nodes = self.layers(self.encode(problem.startBoxes, region), start)
+            solution = None
+            if goal is not None:
+                solution = problem.solutionFromPushes(self.trace(goal, depth))
+            return search.result(status, solution, nodes, time.perf_counter() - start)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def layers(self, startRecord, start):
+        """
+        Développe les couches jusqu'à l'état final.
+        Retourne (statut, état final codé ou None, numéro de sa couche, nœuds développés).
+        """
+        problem = self.problem
+        disk = self.disk
+        metrics = self.metrics
+        deadline = start + self.timeLimit if self.timeLimit is not None else None
+        maxNodes = self.maxNodes
+        bufferStates = self.bufferStates
+        disk.write('layer-0', [startRecord])
+        disk.write('closed-0', [startRecord])
+        layerSize = closedSize = 1
+        nodes = 0
+        depth = 0
+        try:
+            while True:
+                if metrics is not None:
+                    metrics.stage = f'layer {depth}'
+                runs = 0
+                buffer = []
+                for record in disk.read(f'layer-{depth}'):
+                    nodes += 1
+                    if maxNodes is not None and nodes >= maxNodes:
+                        return 'limit', None, depth, nodes
+                    if nodes & 255 == 0:
+                        if deadline is not None and time.perf_counter() > deadline:
+                            return 'timeout', None, depth, nodes
+                        if metrics is not None:
+                            metrics.sample(nodes, layerSize, closedSize)
+                    for _, childBoxes, child in self.expand(record):
+                        if problem.isSolved(childBoxes):
+                            return 'solved', child, depth + 1, nodes
+                        buffer.append(child)
+                        if len(buffer) >= bufferStates:
+                            buffer.sort()
+                            disk.write(f'run-{runs}', unique(buffer))
+                            runs += 1
+                            buffer = []
+                buffer.sort()
+                # Détection différée des doublons : fusion des runs (et du reste du tampon) moins les états vus
+                merged = heapq.merge(unique(buffer), *(disk.read(f'run-{run}') for run in range(runs)))
+                layer = difference(unique(merged), disk.read(f'closed-{depth}'))
+                layerSize = disk.write(f'layer-{depth + 1}', layer)
+                for run in range(runs):
+                    disk.remove(f'run-{run}')
+                if layerSize == 0:
+                    return 'unsolvable', None, depth, nodes
+                self.peakLayer = max(self.peakLayer, layerSize)
+                closedSize = disk.write(f'closed-{depth + 1}',
+                                        heapq.merge(disk.read(f'closed-{depth}'), disk.read(f'layer-{depth + 1}')))
+                disk.remove(f'closed-{depth}')
+                depth += 1
+        finally:
+            if metrics is not None:
+                metrics.setSizes(layerSize, closedSize)
+
+    def trace(self, goal, depth):
+        """Poussées menant à l'état codé #goal de la couche #depth, en remontant les couches sur le disque."""
+        pushes = []
+        target = goal
+        targetBoxes, _ = self.decode(goal)
+        for layer in range(depth - 1, -1, -1):
+            for record in self.disk.read(f'layer-{layer}'):
+                boxes, _ = self.decode(record)
+                if len(boxes - targetBoxes) != 1:
+                    continue  # une poussée ne déplace qu'une caisse
+                push = next((push for push, _, child in self.expand(record) if child == target), None)
+                if push is not None:
+                    pushes.append(push)
+                    target, targetBoxes = record, boxes
+                    break
+            else:
+                raise ValueError(f"Aucun parent dans la couche {layer}")
+        pushes.reverse()
+        return pushes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Résout des niveaux de Sokoban par recherche en largeur "
+                                                 "en mémoire externe (optimale en poussées).")
+    parser.add_argument('levels', nargs='+', type=int, help="numéros de niveaux (à partir de 1)")
+    parser.add_argument('--file', help="collection de niveaux au format texte (ex. levels.txt)")
+    parser.add_argument('--time', type=float, default=3600.0, help="limite de temps par niveau, en secondes")
+    parser.add_argument('--nodes', type=int, default=None, help="limite de nœuds par niveau")
+    parser.add_argument('--no-deadlocks', action='store_true', help="désactive les tests de gel")
+    parser.add_argument('--nearest', action='store_true',
+                        help="élague avec l'objectif le plus proche au lieu de l'affectation minimale")
+    parser.add_argument('--memory', type=int, default=DEFAULT_BUFFER_MEMORY,
+                        help="taille du tampon des enfants, en Mo")
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help="dossier des fichiers de travail")
+    parser.add_argument('--profile', metavar='FICHIER',
+                        help="écrit les relevés de progression (sokobanMetrics) au format JSON Lines")
+    args = parser.parse_args()
+
+    collection = readXsbLevels(args.file) if args.file else SokobanXSBLevels
+    profile = open(args.profile, 'w') if args.profile else None
+    for number in args.levels:
+        xsbMatrix = collection[number - 1]
+        problem = SokobanProblem(xsbMatrix)
+        metrics = None
+        if profile is not None:
+            def onMetrics(record, number=number):
+                profile.write(json.dumps(dict(level=number, mode='external', **record)) + '\n')
+                profile.flush()
+            metrics = SolverMetrics(onMetrics)
+        solver = ExternalSolver(problem, args.time, args.nodes, not args.no_deadlocks, not args.nearest,
+                                args.memory, args.work_dir, metrics)
+        result = solver.solve()
+        if metrics is not None:
+            metrics.report(result.status, result.nodes)
+        if result.solved and not problem.checkSolution(result.solution, xsbMatrix):
+            raise AssertionError("La solution trouvée ne résout pas le niveau")
+        print(f"Niveau {number} : {result}")
+        if result.solved:
+            print(f"  {result.solution}")
+        if solver.disk is not None:
+            print(f"  disque : {solver.disk}, plus grande couche={solver.peakLayer} états")
+    if profile is not None:
+        profile.close()
+
+
+if __name__ == "__main__":
+    main()
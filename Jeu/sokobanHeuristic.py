@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Heuristique d'affectation minimale caisses -> objectifs pour le solveur (voir sokobanSolver).
+
+Le minorant est le coût d'une affectation de coût minimal des caisses aux objectifs, où le coût
+d'un couple (caisse, objectif) est la distance en poussées précalculée (SokobanProblem.distances).
+Il est bien plus fort que la somme des distances à l'objectif le plus proche : deux caisses ne
+peuvent pas compter le même objectif.
+
+L'affectation est calculée par la méthode hongroise sous sa forme "ajout d'une ligne à la fois"
+(potentiels u, v et affectation p). Quand une seule caisse bouge, il suffit de retirer sa ligne
+et de l'ajouter à nouveau avec ses nouveaux coûts : une seule phase en O(n²) au lieu de O(n³).
+Cette mise à jour n'est exacte que si chaque objectif est affecté (autant de caisses que d'objectifs) :
+avec moins de caisses, l'objectif libéré garde un potentiel v négatif et le coût obtenu peut être trop
+élevé (minorant non admissible). L'affectation est alors recalculée complètement.
+Plus de caisses que d'objectifs n'a pas d'affectation : ce cas est refusé (ValueError).
+"""
+from sokobanAnalyse import INFINITY
+from sokobanBoard import WALL
+
+
+"""
+Matching : une affectation optimale et ses potentiels (tableaux indexés à partir de 1, comme la
+    méthode hongroise classique ; la colonne 0 est fictive).
+    - rows[i] : case de la caisse de la ligne i
+    - p[j] : ligne affectée à l'objectif j (0 si aucune)
+    - value : coût total de l'affectation (>= INFINITY si une caisse ne peut atteindre aucun objectif libre)
+"""
+class Matching(object):
+    __slots__ = ('rows', 'u', 'v', 'p', 'value')
+
+    def __init__(self, rows, u, v, p, value):
+        self.rows = rows
+        self.u = u
+        self.v = v
+        self.p = p
+        self.value = value
+
+
+"""
+MatchingHeuristic : calcul complet (#solve) et mise à jour incrémentale (#update) de l'affectation.
+    Par défaut, les cibles sont les objectifs du niveau et les coûts SokobanProblem.distances ;
+    #goals et #distances (cible -> distances de chaque case) permettent d'autres cibles, par exemple
+    les positions de départ des caisses pour la recherche arrière.
+"""
+class MatchingHeuristic(object):
+    def __init__(self, problem, goals=None, distances=None):
+        if distances is None:
+            distances = problem.distances
+        self.goals = sorted(goals if goals is not None else problem.goals)
+        self.columns = len(self.goals)
+        if len(problem.startBoxes) > self.columns:
+            raise ValueError("Plus de caisses que d'objectifs : aucune affectation possible")
+        # costRows[case] : coûts (colonne 0 fictive) de cette case vers chaque objectif
+        self.costRows = [None] * problem.size
+        for index in range(problem.size):
+            if problem.static[index] < WALL:
+                self.costRows[index] = [0] + [distances[goal][index] for goal in self.goals]
+
+    def solve(self, boxes):
+        """Affectation optimale complète pour l'ensemble de caisses #boxes."""
+        columns = self.columns
+        rows = [0] + list(boxes)
+        if len(rows) - 1 > columns:
+            raise ValueError("Plus de caisses que d'objectifs : aucune affectation possible")
+        u = [0] * len(rows)
+        v = [0] * (columns + 1)
+        p = [0] * (columns + 1)
+        for row in range(1, len(rows)):
+            self.addRow(row, rows, u, v, p)
+        return Matching(rows, u, v, p, self.cost(rows, p))
+
+    def update(self, matching, box, target):
+        """
+        Coût de l'affectation optimale quand la caisse #box de #matching va en #target,
+        sans modifier #matching. Retourne le nouveau Matching.
+        """
+        rows = list(matching.rows)
+        if len(rows) - 1 < self.columns:
+            rows[rows.index(box)] = target
+            return self.solve(rows[1:])  # objectifs libres : la mise à jour incrémentale n'est pas exacte
+        u = list(matching.u)
+        v = list(matching.v)
+        p = list(matching.p)
+        row = rows.index(box)
+        rows[row] = target
+        p[p.index(row, 1)] = 0  # l'objectif de la caisse est libéré
+        u[row] = 0  # les v sont toujours <= 0 : u = 0 rend la nouvelle ligne réalisable
+        self.addRow(row, rows, u, v, p)
+        return Matching(rows, u, v, p, self.cost(rows, p))
+
+    def cost(self, rows, p):
+        costRows = self.costRows
+        total = 0
+        for column in range(1, self.columns + 1):
+            if p[column]:
+                total += costRows[rows[p[column]]][column]
+        return total
+
+    def addRow(self, row, rows, u, v, p):
+        """Une phase de la méthode hongroise : affecte la ligne #row par un plus court chemin augmentant."""
+        costRows = self.costRows
+        columns = self.columns
+        infinity = INFINITY * (columns + 1)
+        minv = [infinity] * (columns + 1)
+        used = [False] * (columns + 1)
+        way = [0] * (columns + 1)
+        p[0] = row
+        j0 = 0
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            costs = costRows[rows[i0]]
+            ui0 = u[i0]
+            delta = infinity
+            j1 = 0
+            for j in range(1, columns + 1):
+                if not used[j]:
+                    current = costs[j] - ui0 - v[j]
+                    if current < minv[j]:
+                        minv[j] = current
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(columns + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Indices pour le jeu (touche H dans Jeu.Level).
+
+Le solveur tourne dans un processus à part (un seul processus de calcul, créé à la première demande,
+qui reçoit ses tâches par un tube) : le calcul ne bloque jamais l'interface Tk, qui vient chercher le
+résultat par #HintEngine.poll (appelé avec root.after). #HintEngine.close arrête ce processus, même
+au milieu d'un calcul. Une solution trouvée est mise en cache pour chaque état de son chemin,
+au moment de chaque poussée, par hash d'état (GameState.stateHash) : redemander un indice dans la
+même position, ou plus loin sur le chemin de la solution, répond immédiatement.
+Avec une base de solutions (sokobanSolutions.SolutionDB), une position déjà résolue (lors d'une
+partie précédente ou d'une résolution en lot) ne relance pas le solveur, et chaque nouvelle solution
+y est enregistrée.
+Un indice est la prochaine poussée : le chemin du joueur jusqu'à la caisse, puis la poussée (LURD).
+"""
+import multiprocessing
+
+from sokobanBoard import *
+from sokobanEngine import GameState, LURD_DIRECTIONS, lurdChar
+from sokobanSolver import solve
+
+# Budgets du solveur pour un indice, en secondes : la meilleure solution trouvée en HINT_TIME
+# (mode anytime) est rendue ; si aucune ne l'est, une seconde recherche dispose de HINT_MAX_TIME.
+# Les macro-poussées accélèrent les passes pondérées ; la dernière passe s'en passe (voir AnytimeSolver).
+HINT_TIME = 3.0
+HINT_MAX_TIME = 30.0
+
+
+def solveForHint(xsbMatrix, timeLimit, maxTimeLimit):
+    """Tâche du processus de calcul : SolverResult de la recherche depuis la position #xsbMatrix."""
+    result = solve(xsbMatrix, timeLimit, mode='anytime', macros=True)
+    if not result.solved and result.status != 'unsolvable' and maxTimeLimit > timeLimit:
+        result = solve(xsbMatrix, maxTimeLimit, mode='anytime', macros=True)
+    return result
+
+
+def hintWorker(connection):
+    """Boucle du processus de calcul : reçoit (matrice xsb, budgets) et renvoie le SolverResult."""
+    while True:
+        try:
+            xsbMatrix, timeLimit, maxTimeLimit = connection.recv()
+        except EOFError:  # le jeu est fermé
+            return
+        try:
+            result = solveForHint(xsbMatrix, timeLimit, maxTimeLimit)
+        except MemoryError:
+            result = None
+        connection.send(result)
+
+
+def walkPath(board, target):
+    """Chemin LURD (minuscules) du joueur jusqu'à la case #target sans pousser de caisse, None si impossible."""
+    start = board.moverIndex
+    if start == target:
+        return ''
+    static = board.static
+    dynamic = board.dynamic
+    parents = {start: None}  # case -> (case précédente, direction)
+    frontier = [start]
+    while frontier:
+        nextFrontier = []
+        for index in frontier:
+            for direction, offset in board.offsets.items():
+                neighbour = index + offset
+                if neighbour in parents or static[neighbour] >= WALL or dynamic[neighbour] == BOX:
+                    continue
+                parents[neighbour] = (index, direction)
+                if neighbour == target:
+                    chars = []
+                    while parents[neighbour] is not None:
+                        neighbour, direction = parents[neighbour]
+                        chars.append(lurdChar(direction, False))
+                    return ''.join(reversed(chars))
+                nextFrontier.append(neighbour)
+        frontier = nextFrontier
+    return None
+
+
+"""
+Hint : un indice, la prochaine poussée d'une solution.
+    - #walk : pas du joueur (LURD minuscules) jusqu'à la case d'où pousser
+    - #direction : direction de la poussée
+    - #pushesLeft : nombre de poussées restantes dans la solution (celle-ci comprise)
+"""
+class Hint(object):
+    __slots__ = ('walk', 'direction', 'pushesLeft')
+
+    def __init__(self, walk, direction, pushesLeft):
+        self.walk = walk
+        self.direction = direction
+        self.pushesLeft = pushesLeft
+
+    @property
+    def lurd(self):
+        return self.walk + lurdChar(self.direction, True)
+
+
+"""
+HintEngine : calcul des indices en arrière-plan et cache par hash d'état.
+    #cache : hash d'état -> (poussées de la solution, rang de la prochaine poussée) ; une poussée est
+    notée (case du joueur, direction). Toutes les entrées d'une même solution partagent son tuple.
+"""
+class HintEngine(object):
+    def __init__(self, database=None, timeLimit=HINT_TIME, maxTimeLimit=HINT_MAX_TIME):
+        self.database = database  # SolutionDB ou None, fermée par #close
+        self.timeLimit = timeLimit
+        self.maxTimeLimit = maxTimeLimit
+        self.cache = {}
+        self.failed = set()  # hashes des états pour lesquels aucune solution n'a été trouvée
+        self.process = None  # processus de calcul (hintWorker)
+        self.connection = None  # tube vers ce processus
+        self.pending = None  # (hash de l'état demandé, matrice xsb)
+
+    @property
+    def busy(self):
+        """Vrai si un calcul est en cours."""
+        return self.pending is not None
+
+    def lookup(self, state):
+        """Indice en cache pour le GameState #state, ou None."""
+        if state.isSolved():
+            return None
+        entry = self.cache.get(state.stateHash())
+        if entry is None:
+            return None
+        pushes, rank = entry
+        moverIndex, direction = pushes[rank]
+        walk = walkPath(state.board, moverIndex)
+        if walk is None:
+            return None
+        return Hint(walk, direction, len(pushes) - rank)
+
+    def hasFailed(self, state):
+        """Vrai si le solveur n'a pas trouvé de solution depuis cet état (impasse ou budget dépassé)."""
+        return state.stateHash() in self.failed
+
+    def request(self, state):
+        """
+        Lance le calcul d'un indice pour #state, sauf s'il est en cache ou si un calcul est déjà en cours.
+        Une solution trouvée dans la base est mise en cache tout de suite, sans lancer de calcul.
+        """
+        key = state.stateHash()
+        if self.busy or key in self.cache or key in self.failed:
+            return
+        xsbMatrix = state.xsbMatrix()
+        if self.database is not None:
+            result = self.database.get(xsbMatrix)
+            if result is not None:
+                self.store(xsbMatrix, result.solution)
+                return
+        if self.process is None:
+            # 'spawn' : le processus de calcul ne reçoit pas de copie de l'interprète Tk
+            context = multiprocessing.get_context('spawn')
+            self.connection, workerConnection = context.Pipe()
+            self.process = context.Process(target=hintWorker, args=(workerConnection,), daemon=True)
+            self.process.start()
+            workerConnection.close()
+        self.connection.send((xsbMatrix, self.timeLimit, self.maxTimeLimit))
+        self.pending = (key, xsbMatrix)
+
+    def poll(self):
+        """À appeler régulièrement : vrai quand le calcul en cours vient de se terminer (résultat en cache)."""
+        if self.pending is None:
+            return False
+        if not self.connection.poll():
+            if self.process.is_alive():
+                return False
+            result = None  # processus de calcul arrêté (mémoire...) : il sera relancé à la demande suivante
+            self.stopWorker()
+        else:
+            try:
+                result = self.connection.recv()
+            except EOFError:
+                result = None
+                self.stopWorker()
+        key, xsbMatrix = self.pending
+        self.pending = None
+        if result is None or not result.solved:
+            self.failed.add(key)
+        else:
+            if self.database is not None:
+                self.database.put(xsbMatrix, result, 'anytime')
+            self.store(xsbMatrix, result.solution)
+        return True
+
+    def store(self, xsbMatrix, solution):
+        """Met en cache la solution #solution pour chaque état de son chemin, au moment de chaque poussée."""
+        state = GameState(xsbMatrix)
+        keys = []
+        pushes = []
+        for char in solution:
+            direction = LURD_DIRECTIONS[char]
+            if char.isupper():
+                keys.append(state.stateHash())
+                pushes.append((state.board.moverIndex, direction))
+            state.step(direction)
+        pushes = tuple(pushes)
+        for rank, key in enumerate(keys):
+            self.cache[key] = (pushes, rank)
+
+    def close(self):
+        """Abandonne le calcul en cours, arrête le processus de calcul et ferme la base."""
+        self.stopWorker()
+        self.pending = None
+        if self.database is not None:
+            self.database.close()
+            self.database = None
+
+    def stopWorker(self):
+        """Arrête le processus de calcul (même au milieu d'un calcul)."""
+        if self.process is None:
+            return
+        self.connection.close()
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.process = None
+        self.connection = None
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Mesures de progression des solveurs (sokobanSolver), pour savoir d'où vient la lenteur sur un niveau :
+calcul de l'heuristique, génération des poussées, tests d'impasse ou pression mémoire.
+
+Un solveur muni d'un SolverMetrics relève, tous les 256 nœuds, le nombre de nœuds développés et la
+taille de ses listes ouverte et fermée ; au plus une fois par #interval secondes, et à la fin de la
+recherche, un relevé (dict sérialisable en JSON) est passé à la fonction #callback :
+    - stage : passe de la recherche ('astar', 'weight 3', 'moves', 'ida 42'...)
+    - status : 'running' pendant la recherche, puis le statut du SolverResult
+    - seconds, nodes, nodesPerSecond
+    - open, closed : tailles des listes (pile et entrées occupées de la table en mode ida) au dernier
+      relevé ; dans le relevé final, tailles à la fin de la dernière passe
+    - prunedFreeze, prunedCorral : élagages des tests d'impasse de la passe en cours
+    - phases : part du temps écoulé passée dans chaque phase (PHASES)
+    - peakRss : pic de mémoire résidente du processus, en Mo (None si inconnu)
+La mesure des phases appelle time.perf_counter autour de chaque étape : elle n'est faite que si le
+solveur a un SolverMetrics.
+"""
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # pas de getrusage hors POSIX
+    resource = None
+
+# Intervalle par défaut entre deux relevés, en secondes
+METRICS_INTERVAL = 1.0
+# Phases chronométrées : zone du joueur, génération des poussées (et macro-poussées), tests de gel
+# et de PI-corral, heuristique
+PHASES = ('reach', 'moves', 'deadlocks', 'heuristic')
+
+
+def peakMemory():
+    """Pic de mémoire résidente du processus courant, en Mo (None si inconnu)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+"""
+SolverMetrics : compteurs d'une recherche et envoi des relevés à #callback.
+    #nodesOffset : nœuds des passes précédentes (mode anytime), ajoutés aux nœuds de la passe en cours.
+"""
+class SolverMetrics(object):
+    def __init__(self, callback, interval=METRICS_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.nextReport = self.start + interval
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.stage = 'astar'
+        self.nodesOffset = 0
+        self.nodes = 0
+        self.openSize = 0
+        self.closedSize = 0
+        self.detector = None  # DeadlockDetector de la passe en cours
+
+    def lap(self, phase, since):
+        """Ajoute le temps écoulé depuis #since à #phase ; retourne l'instant présent."""
+        now = time.perf_counter()
+        self.phases[phase] += now - since
+        return now
+
+    def sample(self, nodes, openSize, closedSize):
+        """Relevé des compteurs (tous les 256 nœuds) ; envoie un relevé si l'intervalle est écoulé."""
+        self.nodes = self.nodesOffset + nodes
+        self.openSize = openSize
+        self.closedSize = closedSize
+        if time.perf_counter() >= self.nextReport:
+            self.report('running')
+
+    def setSizes(self, openSize, closedSize):
+        """Tailles des listes à la fin d'une passe (même si elle a fait moins de 256 nœuds)."""
+        self.openSize = openSize
+        self.closedSize = closedSize
+
+    def report(self, status, nodes=None):
+        """Envoie un relevé à #callback (#nodes : nombre total de nœuds, s'il est connu)."""
+        now = time.perf_counter()
+        self.nextReport = now + self.interval
+        if nodes is not None:
+            self.nodes = nodes
+        seconds = now - self.start
+        detector = self.detector
+        self.callback({
+            'stage': self.stage,
+            'status': status,
+            'seconds': round(seconds, 3),
+            'nodes': self.nodes,
+            'nodesPerSecond': round(self.nodes / seconds) if seconds else 0,
+            'open': self.openSize,
+            'closed': self.closedSize,
+            'prunedFreeze': detector.prunedFreeze if detector is not None else 0,
+            'prunedCorral': detector.prunedCorral if detector is not None else 0,
+            'phases': {phase: round(spent / seconds, 3) if seconds else 0.0 for phase, spent in self.phases.items()},
+            'peakRss': round(peakMemory(), 1) if resource is not None else None,
+        })
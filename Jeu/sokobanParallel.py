@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Solveur parallèle par distribution des états selon leur hash (HDA*, "hash distributed A*").
+
+Chaque processus travailleur possède une partie des états : l'état de caisses #boxes appartient au
+travailleur boxesHash % nombre de travailleurs. Tous les états d'un même ensemble de caisses (quelle
+que soit la zone du joueur) vont donc au même travailleur, qui détecte seul les doublons dans sa
+liste fermée. Un travailleur développe des états de sa liste ouverte et envoie les enfants à leur
+propriétaire, par lots (un lot par destination et par tour) dans la file d'entrée de ce dernier.
+
+Le processus principal cadence des tours synchrones : à chaque tour, il indique à chaque travailleur
+combien de lots l'attendent, puis reçoit son compte rendu (lots envoyés, plus petit f de sa liste
+ouverte, solution trouvée). Les états étant développés dans un ordre qui n'est plus globalement
+trié par f, une solution trouvée n'est retenue comme optimale que lorsque plus aucune liste ouverte
+ne contient d'état de f inférieur à son coût et qu'aucun lot n'est en transit. Un état déjà fermé
+est rouvert s'il est atteint ensuite par un chemin plus court.
+Le processus principal n'attend jamais un travailleur sans vérifier qu'il est encore en vie : un
+travailleur à court de mémoire le signale (statut 'memory'), un travailleur arrêté pour une autre raison
+termine la recherche avec le statut 'error'.
+
+Usage :
+    python sokobanParallel.py --file levels.txt 4              # niveau 4 sur un processus par cœur
+    python sokobanParallel.py --jobs 4 --compare 12            # compare au solveur A* séquentiel
+"""
+import argparse
+import heapq
+import multiprocessing
+import os
+import time
+
+from sokobanAnalyse import INFINITY
+from sokobanSolver import AStarSolver, SokobanProblem, SolverResult, solve
+from sokobanXSBLevels import SokobanXSBLevels, readXsbLevels
+
+# Nombre d'états développés par un travailleur à chaque tour
+ROUND_NODES = 256
+# Délai (en secondes) entre deux vérifications qu'un travailleur attendu est encore en vie
+LIVENESS_DELAY = 0.5
+
+
+class WorkerError(Exception):
+    """Un travailleur s'est arrêté (#status : 'memory' ou 'error')."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def workerMain(number, workers, xsbMatrix, deadlocks, matching, macros, commands, inboxes):
+    try:
+        workerLoop(number, workers, xsbMatrix, deadlocks, matching, macros, commands, inboxes)
+    except MemoryError:
+        for queue in inboxes:
+            queue.cancel_join_thread()
+        commands.send(('memory',))
+
+
+def workerLoop(number, workers, xsbMatrix, deadlocks, matching, macros, commands, inboxes):
+    """
+    Boucle d'un processus travailleur.
+    Commandes reçues sur #commands :
+        - ('round', lots attendus, coût de la meilleure solution) -> ('done', lots envoyés par destination,
+          plus petit f ouvert ou None, nœuds développés, (coût, clé) de la meilleure solution locale ou None,
+          (états gelés, poussées élaguées par les PI-corrals))
+        - ('trace', clé) -> (propriétaire du parent, clé du parent, poussée)
+        - ('stop',)
+    Un travailleur à court de mémoire répond ('memory',) à la commande en cours, puis s'arrête.
+    Un état transmis est un tuple (f, h, g, caisses, hash des caisses, joueur, propriétaire du parent,
+    clé du parent, poussée).
+    """
+    problem = SokobanProblem(xsbMatrix)
+    solver = AStarSolver(problem, deadlocks=deadlocks, matching=matching, macros=macros)
+    boxKeys = problem.zobrist.boxKeys
+    inbox = inboxes[number]
+    openList = []
+    closed = {}  # clé -> (g, propriétaire du parent, clé du parent, poussée)
+    counter = 0
+    nodes = 0
+    goal = None  # (coût, clé) de la meilleure solution trouvée par ce travailleur
+
+    startHash = problem.boxesHash(problem.startBoxes)
+    if startHash % workers == number:
+        h = solver.heuristic(problem.startBoxes)
+        openList.append((h, h, counter, 0, problem.startBoxes, startHash, problem.startMover, None, None, None))
+
+    while True:
+        command = commands.recv()
+        if command[0] == 'stop':
+            for queue in inboxes:
+                queue.cancel_join_thread()  # des lots peuvent rester en transit après un arrêt anticipé
+            return
+        if command[0] == 'trace':
+            _, parentOwner, parentKey, push = closed[command[1]]
+            commands.send((parentOwner, parentKey, push))
+            continue
+        _, expected, bound = command
+        for _ in range(expected):
+            for f, h, g, boxes, boxesHash, mover, parentOwner, parentKey, push in inbox.get():
+                if f < bound:
+                    counter += 1
+                    heapq.heappush(openList, (f, h, counter, g, frozenset(boxes), boxesHash, mover,
+                                              parentOwner, parentKey, push))
+        batches = [[] for _ in range(workers)]
+        expanded = 0
+        while openList and expanded < ROUND_NODES and openList[0][0] < bound:
+            f, h, _, g, boxes, boxesHash, mover, parentOwner, parentKey, push = heapq.heappop(openList)
+            marks, region = problem.reach(boxes, mover)
+            key = problem.stateKey(boxesHash, region)
+            known = closed.get(key)
+            if known is not None and known[0] <= g:
+                continue
+            closed[key] = (g, parentOwner, parentKey, push)
+            if problem.isSolved(boxes):
+                if goal is None or g < goal[0]:
+                    goal = (g, key)
+                    bound = g
+                continue
+            expanded += 1
+            for childH, cost, box, target, childBoxes, childMover, childPush in solver.children(
+                    boxes, marks, push, h):
+                childF = g + cost + childH
+                if childF >= bound:
+                    continue
+                childHash = boxesHash ^ boxKeys[box] ^ boxKeys[target]
+                owner = childHash % workers
+                if owner == number:
+                    counter += 1
+                    heapq.heappush(openList, (childF, childH, counter, g + cost, childBoxes, childHash, childMover,
+                                              number, key, childPush))
+                else:
+                    batches[owner].append((childF, childH, g + cost, tuple(childBoxes), childHash, childMover,
+                                           number, key, childPush))
+        nodes += expanded
+        sent = [0] * workers
+        for owner, batch in enumerate(batches):
+            if batch:
+                inboxes[owner].put(batch)
+                sent[owner] = 1
+        detector = solver.detector
+        pruned = (detector.prunedFreeze, detector.prunedCorral) if detector is not None else (0, 0)
+        commands.send(('done', sent, openList[0][0] if openList else None, nodes, goal, pruned))
+
+
+"""
+ParallelSolver : recherche HDA* sur #workers processus, optimale en nombre de poussées (sauf avec
+    macros=True, voir sokobanSolver.AStarSolver).
+"""
+class ParallelSolver(object):
+    def __init__(self, xsbMatrix, workers=None, timeLimit=None, maxNodes=None, deadlocks=True, matching=True,
+                 macros=False):
+        self.xsbMatrix = xsbMatrix
+        self.workers = workers or os.cpu_count() or 1
+        self.timeLimit = timeLimit  # en secondes, None : pas de limite
+        self.maxNodes = maxNodes  # None : pas de limite
+        self.deadlocks = deadlocks
+        self.matching = matching
+        self.macros = macros
+        self.processes = []  # processus travailleurs de la recherche en cours
+
+    def solve(self):
+        start = time.perf_counter()
+        problem = SokobanProblem(self.xsbMatrix)
+        if AStarSolver(problem, matching=self.matching).heuristic(problem.startBoxes) >= INFINITY:
+            return SolverResult('unsolvable', seconds=time.perf_counter() - start)
+        workers = self.workers
+        deadline = start + self.timeLimit if self.timeLimit is not None else None
+        context = multiprocessing.get_context()
+        inboxes = [context.Queue() for _ in range(workers)]
+        pipes = [context.Pipe() for _ in range(workers)]
+        processes = [context.Process(target=workerMain, daemon=True,
+                                     args=(number, workers, self.xsbMatrix, self.deadlocks, self.matching,
+                                           self.macros, pipes[number][1], inboxes))
+                     for number in range(workers)]
+        for process in processes:
+            process.start()
+        commands = [pipe[0] for pipe in pipes]
+        self.processes = processes
+        try:
+            status, goal, nodes, pruned = self.run(commands, deadline)
+            solution = None
+            if goal is not None:
+                solution = problem.solutionFromPushes(self.trace(commands, goal))
+            return SolverResult(status, solution, nodes, time.perf_counter() - start, *pruned)
+        except WorkerError as error:
+            return SolverResult(error.status, seconds=time.perf_counter() - start)
+        finally:
+            for command, process in zip(commands, processes):
+                if process.is_alive():
+                    try:
+                        command.send(('stop',))
+                    except OSError:
+                        pass
+            for process in processes:
+                process.join(LIVENESS_DELAY)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+
+    def receive(self, commands, number):
+        """Réponse du travailleur #number ; lève WorkerError s'il s'est arrêté ou manque de mémoire."""
+        command = commands[number]
+        process = self.processes[number]
+        while not command.poll(LIVENESS_DELAY):
+            if not process.is_alive():
+                raise WorkerError('error', f"Le travailleur {number} s'est arrêté (code {process.exitcode})")
+        try:
+            reply = command.recv()
+        except EOFError:
+            raise WorkerError('error', f"Le travailleur {number} s'est arrêté (code {process.exitcode})")
+        if reply[0] == 'memory':
+            raise WorkerError('memory', f"Le travailleur {number} manque de mémoire")
+        return reply
+
+    def run(self, commands, deadline):
+        """
+        Cadence les tours jusqu'à la fin de la recherche.
+        Retourne (statut, (coût, propriétaire, clé) de la solution ou None, nœuds, (gelés, corrals)).
+        """
+        workers = self.workers
+        expected = [0] * workers
+        bound = INFINITY
+        goal = None
+        while True:
+            for number, command in enumerate(commands):
+                command.send(('round', expected[number], bound))
+            expected = [0] * workers
+            lowest = INFINITY
+            nodes = prunedFreeze = prunedCorral = 0
+            for number in range(workers):
+                _, sent, minF, workerNodes, workerGoal, (freeze, corral) = self.receive(commands, number)
+                prunedFreeze += freeze
+                prunedCorral += corral
+                for owner in range(workers):
+                    expected[owner] += sent[owner]
+                if minF is not None:
+                    lowest = min(lowest, minF)
+                nodes += workerNodes
+                if workerGoal is not None and (goal is None or workerGoal[0] < goal[0]):
+                    goal = (workerGoal[0], number, workerGoal[1])
+                    bound = goal[0]
+            pruned = (prunedFreeze, prunedCorral)
+            if not any(expected) and lowest >= bound:
+                return ('solved' if goal is not None else 'unsolvable'), goal, nodes, pruned
+            if self.maxNodes is not None and nodes >= self.maxNodes:
+                return 'limit', None, nodes, pruned
+            if deadline is not None and time.perf_counter() > deadline:
+                return 'timeout', None, nodes, pruned
+
+    def trace(self, commands, goal):
+        """Suite des poussées de la solution, en remontant les parents de travailleur en travailleur."""
+        pushes = []
+        _, owner, key = goal
+        while True:
+            commands[owner].send(('trace', key))
+            owner, key, push = self.receive(commands, owner)
+            if push is None:
+                break
+            pushes.append(push)
+        pushes.reverse()
+        return pushes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Résout un niveau de Sokoban sur plusieurs processus (HDA*).")
+    parser.add_argument('levels', nargs='+', type=int, help="numéros de niveaux (à partir de 1)")
+    parser.add_argument('--file', help="collection de niveaux au format texte (ex. levels.txt)")
+    parser.add_argument('--jobs', type=int, default=None, help="nombre de processus (par défaut : un par cœur)")
+    parser.add_argument('--time', type=float, default=600.0, help="limite de temps par niveau, en secondes")
+    parser.add_argument('--nodes', type=int, default=None, help="limite de nœuds par niveau")
+    parser.add_argument('--no-deadlocks', action='store_true', help="désactive les tests de gel et de PI-corral")
+    parser.add_argument('--nearest', action='store_true',
+                        help="heuristique de l'objectif le plus proche au lieu de l'affectation minimale")
+    parser.add_argument('--macros', action='store_true',
+                        help="macro-poussées (tunnels et salles d'objectifs) : plus rapide, mais la solution "
+                             "n'est plus garantie optimale en poussées")
+    parser.add_argument('--compare', action='store_true',
+                        help="résout aussi avec le solveur séquentiel et affiche l'accélération")
+    args = parser.parse_args()
+
+    collection = readXsbLevels(args.file) if args.file else SokobanXSBLevels
+    for number in args.levels:
+        xsbMatrix = collection[number - 1]
+        solver = ParallelSolver(xsbMatrix, args.jobs, args.time, args.nodes, not args.no_deadlocks, not args.nearest,
+                                args.macros)
+        result = solver.solve()
+        if result.solved and not SokobanProblem(xsbMatrix).checkSolution(result.solution, xsbMatrix):
+            raise AssertionError("La solution trouvée ne résout pas le niveau")
+        print(f"Niveau {number} ({solver.workers} processus) : {result}")
+        if result.solved:
+            print(f"  {result.solution}")
+        if args.compare:
+            reference = solve(xsbMatrix, args.time, args.nodes, not args.no_deadlocks, not args.nearest,
+                              macros=args.macros)
+            print(f"Niveau {number} (séquentiel) : {reference}")
+            if result.seconds:
+                print(f"  accélération : x{reference.seconds / result.seconds:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Test d'endurance de l'interface : une longue partie (100 000 touches par défaut) jouée sur un Jeu.Level,
+au hasard (flèches, avec quelques annulations et rétablissements), sans fenêtre à l'écran.
+
+Vérifie que :
+    - le nombre d'items du canvas (canvas.find_all()) ne change pas : un pas ne fait que déplacer le
+      joueur et les caisses, sans créer d'item ni d'image ;
+    - la mémoire résidente (pic, voir sokobanMetrics.peakMemory) reste bornée : après une mise en
+      route de WARMUP_MOVES touches, elle n'augmente pas de plus de RSS_SLACK Mo.
+
+Si un affichage est disponible ($DISPLAY, ou xvfb-run), le vrai canvas Tk est utilisé (fenêtre
+masquée) ; sinon, un canvas d'enregistrement (RecordingCanvas) le remplace, avec les mêmes appels,
+et les images ne sont pas décodées. Ces remplacements sont annulés à la fin de la partie.
+Le test unitaire correspondant est test_sokobanSession.
+
+Usage :
+    python sokobanSession.py                        # 100 000 touches sur le premier niveau
+    python sokobanSession.py --moves 20000 --level 3
+    xvfb-run python sokobanSession.py               # avec le vrai canvas Tk
+"""
+import argparse
+import contextlib
+import io
+import random
+import sys
+
+with contextlib.redirect_stdout(io.StringIO()):  # Jeu affiche un message à l'import
+    import Jeu
+from sokobanMetrics import peakMemory
+from sokobanXSBLevels import SokobanXSBLevels
+
+SESSION_MOVES = 100000
+WARMUP_MOVES = 2000
+SAMPLE_MOVES = 10000  # intervalle entre deux relevés
+RSS_SLACK = 8.0  # augmentation tolérée du pic de mémoire après la mise en route, en Mo
+# Touches jouées, avec leurs poids : surtout des pas, parfois une annulation ou un rétablissement
+KEYS = ('Up', 'Down', 'Left', 'Right', 'u', 'r')
+WEIGHTS = (10, 10, 10, 10, 2, 1)
+
+
+"""
+RecordingCanvas : remplaçant du canvas Tk sans affichage, qui tient la liste de ses items.
+"""
+class RecordingCanvas(object):
+    def __init__(self, *args, **kwargs):
+        self.items = {}
+        self.lastId = 0
+
+    def _root(self):
+        return self
+
+    def create_image(self, *args, **kwargs):
+        self.lastId += 1
+        self.items[self.lastId] = (args, kwargs)
+        return self.lastId
+
+    create_text = create_image
+
+    def coords(self, item, *args):
+        if item not in self.items:
+            raise ValueError(f"Item inconnu : {item}")
+
+    def itemconfig(self, item, **kwargs):
+        if item not in self.items:
+            raise ValueError(f"Item inconnu : {item}")
+
+    def delete(self, item):
+        self.items.pop(item, None)
+
+    def find_all(self):
+        return tuple(self.items)
+
+    def tag_raise(self, *args):
+        pass
+
+    def pack(self, *args, **kwargs):
+        pass
+
+    def destroy(self):
+        self.items.clear()
+
+
+"""
+HeadlessRoot : remplaçant de la racine Tk (liaisons de touches et root.after ignorées).
+"""
+class HeadlessRoot(object):
+    def bind(self, *args):
+        pass
+
+    def unbind(self, *args):
+        pass
+
+    def after(self, *args):
+        pass
+
+
+class KeyEvent(object):
+    def __init__(self, keysym):
+        self.keysym = keysym
+
+
+@contextlib.contextmanager
+def sessionRoot():
+    """
+    Produit (racine, vrai canvas Tk utilisé) : une racine Tk masquée si un affichage est disponible,
+    sinon HeadlessRoot, Jeu.tk.Canvas et les images de SpriteCache étant remplacés jusqu'à la sortie.
+    """
+    try:
+        root = Jeu.tk.Tk()
+    except Jeu.tk.TclError:
+        root = None
+    if root is not None:
+        root.withdraw()
+        try:
+            yield root, True
+        finally:
+            root.destroy()
+        return
+    saved = (Jeu.tk.Canvas, Jeu.SpriteCache.__dict__['get'], Jeu.SpriteCache.__dict__['staticLayer'])
+    Jeu.tk.Canvas = RecordingCanvas
+    Jeu.SpriteCache.get = classmethod(lambda cls, canvas, fileName: fileName)
+    Jeu.SpriteCache.staticLayer = classmethod(lambda cls, canvas, xsbMatrix, tileSize=64: 'static')
+    try:
+        yield HeadlessRoot(), False
+    finally:
+        Jeu.tk.Canvas, Jeu.SpriteCache.get, Jeu.SpriteCache.staticLayer = saved
+
+
+def longSession(xsbMatrix, moves=SESSION_MOVES, seed=0):
+    """
+    Joue #moves touches au hasard sur le niveau #xsbMatrix.
+    Retourne (vrai canvas Tk utilisé, pas effectués, relevés) ; un relevé est (touches jouées, items du
+    canvas, pic de mémoire en Mo). Les touches qui butent sur un mur ne font pas de pas.
+    """
+    with sessionRoot() as (root, realTk):
+        level = Jeu.Level(root, xsbMatrix, None)
+        level.checkWinCondition = lambda: None  # la partie continue même si le niveau est résolu
+        rng = random.Random(seed)
+        samples = [(0, len(level.canvas.find_all()), peakMemory())]
+        try:
+            for move in range(1, moves + 1):
+                level.keypressed(KeyEvent(rng.choices(KEYS, WEIGHTS)[0]))
+                if realTk and move % 100 == 0:
+                    root.update_idletasks()
+                if move == WARMUP_MOVES or move % SAMPLE_MOVES == 0 or move == moves:
+                    samples.append((move, len(level.canvas.find_all()), peakMemory()))
+        finally:
+            level.hints.close()
+        return realTk, level.score.player_deplacement, samples
+
+
+def sessionProblems(samples):
+    """Anomalies des relevés #samples de longSession (liste de messages, vide si tout va bien)."""
+    problems = []
+    items = {items for _, items, _ in samples}
+    if len(items) != 1:
+        problems.append(f"Le nombre d'items du canvas a changé : {sorted(items)}")
+    warm = [rss for move, _, rss in samples if move >= WARMUP_MOVES and rss is not None]
+    if warm and warm[-1] - warm[0] > RSS_SLACK:
+        problems.append(f"La mémoire a augmenté de {warm[-1] - warm[0]:.1f}Mo")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test d'endurance de l'interface Sokoban (sans fenêtre).")
+    parser.add_argument('--moves', type=int, default=SESSION_MOVES, help="nombre de touches jouées")
+    parser.add_argument('--level', type=int, default=1, help="numéro du niveau (à partir de 1)")
+    parser.add_argument('--seed', type=int, default=0, help="graine du hasard")
+    args = parser.parse_args()
+
+    realTk, steps, samples = longSession(SokobanXSBLevels[args.level - 1], args.moves, args.seed)
+    canvasName = "Tk" if realTk else "d'enregistrement"
+    print(f"Canvas {canvasName}, {args.moves} touches, {steps} pas effectués")
+    for move, items, rss in samples:
+        print(f"  {move:>7} touches : {items} items, pic de mémoire {rss if rss is None else f'{rss:.1f}Mo'}")
+    problems = sessionProblems(samples)
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+    print("OK : items du canvas constants, mémoire bornée")
+
+
+if __name__ == "__main__":
+    main()
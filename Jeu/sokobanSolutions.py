@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Base de solutions sur disque (SQLite), pour ne pas résoudre deux fois le même niveau.
+
+Un niveau est identifié par un hash canonique de sa position (#levelHash) : il ne dépend que de
+l'intérieur du niveau (murs, sols, objectifs, caisses et joueur), pas de la façon dont la matrice xsb
+est écrite (espaces de fin de ligne, lignes vides, décalage, '-' ou ' ' pour le sol, niveau de
+SokobanXSBLevels, de levels.txt ou position en cours de partie). Pour chaque niveau, la base garde la
+meilleure solution LURD connue (moins de poussées, puis moins de pas), ses nombres de poussées et de
+pas et les statistiques du solveur qui l'a trouvée.
+
+La base n'est qu'un cache : si le fichier ne peut pas être ouvert ou écrit (dossier en lecture seule,
+fichier corrompu ou verrouillé), elle se comporte comme une base vide (#get rend None, #put False)
+et l'erreur est gardée dans SolutionDB.error.
+
+Les résolutions en lot (sokobanBatch) et les indices du jeu (sokobanHint) consultent la base avant de
+lancer le solveur, et y enregistrent leurs nouvelles solutions.
+"""
+import hashlib
+import os
+import sqlite3
+import time
+
+from sokobanAnalyse import cacheDir
+from sokobanEngine import GameState
+from sokobanSolver import SolverResult
+
+# Fichier par défaut de la base, dans le dossier de cache de sokobanAnalyse
+DEFAULT_DATABASE = os.path.join(cacheDir, 'solutions.sqlite')
+LEVEL_HASH_VERSION = b'level 1\n'  # à changer si la forme canonique change
+
+
+def canonicalXsb(xsbMatrix):
+    """
+    Forme canonique (texte) de la position #xsbMatrix : l'intérieur du niveau (cases atteignables depuis
+    le joueur sans traverser de mur) et les murs qui le bordent, recadrés ; sol noté '-', extérieur ' ',
+    sans espaces de fin de ligne.
+    """
+    cells = {(y, x): char for y, line in enumerate(xsbMatrix) for x, char in enumerate(line)}
+    start = next((position for position, char in cells.items() if char in '@+'), None)
+    inside = set()
+    frontier = [start] if start is not None else []
+    while frontier:
+        y, x = frontier.pop()
+        if (y, x) in inside or cells.get((y, x), '#') == '#':
+            continue
+        inside.add((y, x))
+        frontier.extend(((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)))
+    kept = set(inside)
+    for y, x in inside:
+        kept.update((y + dy, x + dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if cells.get((y + dy, x + dx)) == '#')
+    if not kept:
+        return ''
+    top, bottom = min(y for y, _ in kept), max(y for y, _ in kept)
+    left, right = min(x for _, x in kept), max(x for _, x in kept)
+    lines = []
+    for y in range(top, bottom + 1):
+        line = []
+        for x in range(left, right + 1):
+            char = cells.get((y, x), ' ')
+            if (y, x) not in kept:
+                line.append(' ')
+            elif (y, x) in inside and char not in '$.*@+':
+                line.append('-')
+            else:
+                line.append(char)
+        lines.append(''.join(line).rstrip())
+    return '\n'.join(lines)
+
+
+def levelHash(xsbMatrix):
+    """Hash canonique (hexadécimal) de la position décrite par la matrice xsb #xsbMatrix."""
+    return hashlib.sha1(LEVEL_HASH_VERSION + canonicalXsb(xsbMatrix).encode()).hexdigest()
+
+
+"""
+SolutionDB : base de solutions (une table, une ligne par niveau).
+    #get rend un SolverResult 'solved' (solution rejouée et vérifiée) ou None ;
+    #put n'enregistre une solution que si elle est meilleure que celle de la base.
+    #error : message de la dernière erreur d'accès au fichier (None si aucune) ; une base qui n'a pas
+    pu être ouverte (#connection None) reste vide.
+"""
+class SolutionDB(object):
+    def __init__(self, path=DEFAULT_DATABASE):
+        self.path = path
+        self.connection = None
+        self.error = None
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(path)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS solutions ("
+                " level TEXT PRIMARY KEY,"  # levelHash
+                " solution TEXT NOT NULL,"  # LURD
+                " pushes INTEGER NOT NULL,"
+                " moves INTEGER NOT NULL,"
+                " nodes INTEGER NOT NULL,"
+                " seconds REAL NOT NULL,"
+                " solver TEXT NOT NULL,"  # mode de recherche ayant trouvé la solution
+                " updated REAL NOT NULL)")  # date d'enregistrement (time.time())
+            self.connection.commit()
+        except (OSError, sqlite3.Error) as error:
+            self.error = f"{path} : {error}"
+            if self.connection is not None:
+                self.connection.close()  # fichier qui n'est pas une base SQLite, ou en lecture seule
+                self.connection = None
+
+    def get(self, xsbMatrix):
+        """Meilleure solution connue pour #xsbMatrix, ou None (absente, invalide ou base inaccessible)."""
+        if self.connection is None:
+            return None
+        try:
+            row = self.connection.execute(
+                "SELECT solution, nodes, seconds FROM solutions WHERE level = ?", (levelHash(xsbMatrix),)).fetchone()
+        except sqlite3.Error as error:  # base verrouillée par un autre processus...
+            self.error = f"{self.path} : {error}"
+            return None
+        if row is None:
+            return None
+        solution, nodes, seconds = row
+        state = GameState(xsbMatrix)
+        if state.playLurd(solution) != len(solution) or not state.isSolved():
+            return None  # ligne écrite pour un autre codage du plateau : on la remplacera
+        return SolverResult('solved', solution, nodes, seconds)
+
+    def put(self, xsbMatrix, result, solver='astar'):
+        """Enregistre la solution du SolverResult #result si elle est meilleure ; retourne vrai si c'est le cas."""
+        if not result.solved or self.connection is None:
+            return False
+        level = levelHash(xsbMatrix)
+        try:
+            row = self.connection.execute("SELECT pushes, moves FROM solutions WHERE level = ?", (level,)).fetchone()
+            if row is not None and tuple(row) <= (result.pushes, result.moves) and self.get(xsbMatrix) is not None:
+                return False
+            self.connection.execute(
+                "INSERT OR REPLACE INTO solutions (level, solution, pushes, moves, nodes, seconds, solver, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (level, result.solution, result.pushes, result.moves, result.nodes, result.seconds, solver, time.time()))
+            self.connection.commit()
+        except sqlite3.Error as error:
+            self.error = f"{self.path} : {error}"
+            self.connection.rollback()
+            return False
+        return True
+
+    def __len__(self):
+        if self.connection is None:
+            return 0
+        try:
+            return self.connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        except sqlite3.Error as error:
+            self.error = f"{self.path} : {error}"
+            return 0
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
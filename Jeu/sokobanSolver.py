@@ -0,0 +1,963 @@
+# -*- coding: utf-8 -*-
+"""
+Solveur Sokoban par recherche A* sur les poussées de caisses.
+
+Un état de la recherche est l'ensemble des positions des caisses et la zone accessible au joueur :
+les pas du joueur entre deux poussées sont "compressés" dans le calcul d'accessibilité.
+Chaque état exploré est mémorisé par son hash de Zobrist (voir sokobanBoard.ZobristTable).
+Le coût est le nombre de poussées ; l'heuristique (minorant) est la somme, pour chaque caisse,
+du nombre minimal de poussées pour l'amener sur un objectif, chaque objectif ne servant qu'à une
+caisse (affectation minimale, voir sokobanHeuristic).
+La solution est rendue au format LURD, rejouable par GameState.playLurd.
+
+Usage :
+    python sokobanSolver.py                 # tous les niveaux de SokobanXSBLevels
+    python sokobanSolver.py 1 3 5           # quelques niveaux (numérotés à partir de 1)
+    python sokobanSolver.py --file levels.txt --time 30
+    python sokobanSolver.py --mode bidirectional 12            # recherche bidirectionnelle
+    python sokobanSolver.py --mode ida --table-memory 256 12   # IDA* en mémoire bornée
+    python sokobanSolver.py --mode anytime --time 10 12        # solutions améliorées pendant 10 s
+    python sokobanSolver.py --mode external --table-memory 16 12   # largeur en mémoire externe (disque)
+    python sokobanSolver.py --profile profil.jsonl 12          # relevés de progression (sokobanMetrics)
+"""
+import argparse
+import heapq
+import json
+import time
+from array import array
+
+from sokobanAnalyse import INFINITY, deadSquares, goalDistances, goalRooms, pushDistances, tunnelSquares
+from sokobanBoard import *
+from sokobanDeadlock import DeadlockDetector
+from sokobanHeuristic import MatchingHeuristic
+from sokobanMetrics import SolverMetrics
+from sokobanEngine import GameState, lurdChar, CODE_DIRECTIONS
+from sokobanXSBLevels import SokobanXSBLevels, readXsbLevels
+
+# Table de transposition du mode IDA* : taille par défaut en Mo, et octets par entrée (clé, g, itération)
+DEFAULT_TABLE_MEMORY = 64
+TABLE_ENTRY_BYTES = 12
+
+
+"""
+SokobanProblem : données précalculées d'un niveau, communes à tous les modes de recherche.
+    - #steps : décalages d'index des quatre directions, dans l'ordre de CODE_DIRECTIONS
+    - #neighbours : pour chaque case praticable, les cases praticables voisines
+    - #distances : pour chaque objectif, la distance en poussées de chaque case vers cet objectif
+      (sokobanAnalyse.goalDistances, lue dans le cache disque si possible)
+    - #minDistance : pour chaque case, la plus petite de ces distances
+    - #dead : cases mortes (sokobanAnalyse.deadSquares), jamais proposées comme arrivée d'une poussée
+    - #tunnels, #rooms : tunnels et salles d'objectifs (par case d'entrée), pour les macro-poussées
+    Une poussée est notée (case de la caisse, case d'arrivée) ; une macro-poussée est notée
+    (case de la caisse, case d'arrivée finale, poussées successives).
+"""
+class SokobanProblem(object):
+    def __init__(self, xsbMatrix):
+        board = CompactBoard.fromXsb(xsbMatrix)
+        self.board = board
+        self.width = board.width
+        self.static = board.static
+        self.size = len(board.static)
+        width = board.width
+        self.steps = tuple(board.offsets[direction] for direction in CODE_DIRECTIONS)
+        self.goals = frozenset(board.goalIndices())
+        self.startBoxes = frozenset(board.boxIndices())
+        self.startMover = board.moverIndex
+        self.zobrist = ZobristTable.forSize(self.size)
+        self.dead = deadSquares(board)
+        self.tunnels = tunnelSquares(board)
+        self.rooms = {room.entrance: room for room in goalRooms(board)}
+        static = self.static
+        self.neighbours = [()] * self.size
+        for index in range(self.size):
+            if static[index] < WALL:
+                self.neighbours[index] = tuple(index + step for step in (1, -1, width, -width)
+                                               if static[index + step] < WALL)
+        self.distances = goalDistances(board)
+        self.minDistance = [min((distances[index] for distances in self.distances.values()), default=INFINITY)
+                            for index in range(self.size)]
+
+    def reach(self, boxes, mover):
+        """
+        Cases accessibles au joueur depuis #mover sans pousser de caisse.
+        Retourne (marques, plus petit index accessible) : les marques valent 1 pour une case accessible.
+        """
+        neighbours = self.neighbours
+        marks = bytearray(self.size)
+        marks[mover] = 1
+        stack = [mover]
+        smallest = mover
+        while stack:
+            index = stack.pop()
+            for neighbour in neighbours[index]:
+                if not marks[neighbour] and neighbour not in boxes:
+                    marks[neighbour] = 1
+                    stack.append(neighbour)
+                    if neighbour < smallest:
+                        smallest = neighbour
+        return marks, smallest
+
+    def pushes(self, boxes, marks):
+        """Poussées possibles : liste de (case de la caisse, case d'arrivée) vers une case non morte."""
+        static = self.static
+        dead = self.dead
+        result = []
+        for box in boxes:
+            for step in self.steps:
+                if marks[box - step]:
+                    target = box + step
+                    if static[target] < WALL and not dead[target] and target not in boxes:
+                        result.append((box, target))
+        return result
+
+    def macroPush(self, boxes, box, target):
+        """
+        Prolonge la poussée de #box vers #target en macro-poussée quand c'est possible :
+            - une caisse poussée dans un tunnel (joueur et caisse bordés de murs) y est poussée jusqu'au
+              bout, sauf si elle atteint un objectif ou si la case suivante est occupée ou morte ;
+            - une caisse poussée sur l'entrée d'une salle d'objectifs dont les objectifs sont remplis dans
+              l'ordre prévu est amenée directement sur le prochain objectif de cet ordre.
+        Retourne (case d'arrivée finale, poussée ou macro-poussée, case finale du joueur, nombre de poussées).
+        """
+        static = self.static
+        dead = self.dead
+        step = target - box
+        tunnel = self.tunnels[0] if step in (1, -1) else self.tunnels[1]
+        route = [(box, target)]
+        origin = box
+        while tunnel[origin] and tunnel[target] and static[target] != GOAL:
+            following = target + step
+            if static[following] >= WALL or dead[following] or following in boxes:
+                break
+            route.append((target, following))
+            origin, target = target, following
+        room = self.rooms.get(target)
+        if room is not None and origin == room.outside:
+            filled = sum(1 for index in boxes if index in room.cells)
+            fillOrder = room.fillOrder
+            if filled < len(fillOrder) and all(goal in boxes for goal in fillOrder[:filled]):
+                route.extend(room.routes[filled])
+                target = fillOrder[filled]
+        if len(route) == 1:
+            return target, (box, target), box, 1
+        return target, (box, target, tuple(route)), route[-1][0], len(route)
+
+    def heuristic(self, boxes):
+        """Minorant du nombre de poussées restantes."""
+        minDistance = self.minDistance
+        return sum(minDistance[box] for box in boxes)
+
+    def boxesHash(self, boxes):
+        return self.zobrist.boxesHash(boxes)
+
+    def stateKey(self, boxesHash, region):
+        """Clé de Zobrist d'un état à partir du hash des caisses et de la zone normalisée du joueur."""
+        return boxesHash ^ self.zobrist.moverKeys[region]
+
+    def isSolved(self, boxes):
+        return boxes <= self.goals
+
+    def walkDistances(self, boxes, mover):
+        """
+        Nombre de pas du joueur depuis #mover vers chaque case, sans pousser de caisse.
+        Retourne (distances, marques) : distances vaut -1 pour une case inaccessible.
+        """
+        neighbours = self.neighbours
+        distances = [-1] * self.size
+        marks = bytearray(self.size)
+        distances[mover] = 0
+        marks[mover] = 1
+        frontier = [mover]
+        distance = 0
+        while frontier:
+            distance += 1
+            nextFrontier = []
+            for index in frontier:
+                for neighbour in neighbours[index]:
+                    if not marks[neighbour] and neighbour not in boxes:
+                        marks[neighbour] = 1
+                        distances[neighbour] = distance
+                        nextFrontier.append(neighbour)
+            frontier = nextFrontier
+        return distances, marks
+
+    def walk(self, boxes, start, target):
+        """Chemin LURD (minuscules) du joueur de #start à #target sans pousser de caisse, None si impossible."""
+        if start == target:
+            return ''
+        parents = {start: None}
+        frontier = [start]
+        while frontier:
+            nextFrontier = []
+            for index in frontier:
+                for neighbour in self.neighbours[index]:
+                    if neighbour not in parents and neighbour not in boxes:
+                        parents[neighbour] = index
+                        if neighbour == target:
+                            return self.pathFromParents(parents, target)
+                        nextFrontier.append(neighbour)
+            frontier = nextFrontier
+        return None
+
+    def pathFromParents(self, parents, target):
+        chars = []
+        index = target
+        while parents[index] is not None:
+            chars.append(lurdChar(self.directionOf(index - parents[index]), False))
+            index = parents[index]
+        return ''.join(reversed(chars))
+
+    def directionOf(self, step):
+        return CODE_DIRECTIONS[self.steps.index(step)]
+
+    def solutionFromPushes(self, pushes):
+        """Convertit une suite de poussées et de macro-poussées en solution LURD complète."""
+        boxes = set(self.startBoxes)
+        mover = self.startMover
+        chars = []
+        for box, target in self.singlePushes(pushes):
+            step = target - box
+            path = self.walk(boxes, mover, box - step)
+            if path is None:
+                raise ValueError(f"Poussée impossible depuis {mover} : {box} -> {target}")
+            chars.append(path)
+            chars.append(lurdChar(self.directionOf(step), True))
+            boxes.remove(box)
+            boxes.add(target)
+            mover = box
+        return ''.join(chars)
+
+    @staticmethod
+    def singlePushes(pushes):
+        """Suite de poussées simples, les macro-poussées étant remplacées par leurs poussées successives."""
+        for push in pushes:
+            if len(push) > 2:
+                yield from push[2]
+            else:
+                yield push
+
+    def checkSolution(self, lurd, xsbMatrix):
+        """Vrai si la solution #lurd, rejouée dans un GameState, résout le niveau."""
+        state = GameState(xsbMatrix)
+        return state.playLurd(lurd) == len(lurd) and state.isSolved()
+
+
+"""
+SolverResult : résultat d'une recherche.
+    status vaut 'solved', 'unsolvable' (espace d'états épuisé), 'bounded' (espace d'états épuisé sous
+    la borne d'une solution déjà connue : pas de solution plus courte), 'timeout', 'limit' (nombre de nœuds),
+    'memory' (budget de mémoire dépassé, voir sokobanBatch) ou 'error' (un processus de calcul s'est
+    arrêté, voir sokobanParallel).
+"""
+class SolverResult(object):
+    def __init__(self, status, solution=None, nodes=0, seconds=0.0, prunedFreeze=0, prunedCorral=0):
+        self.status = status
+        self.solution = solution  # solution LURD, None si non résolu
+        self.nodes = nodes  # nombre d'états développés
+        self.seconds = seconds
+        self.prunedFreeze = prunedFreeze  # états éliminés par le test de gel
+        self.prunedCorral = prunedCorral  # poussées éliminées par les PI-corrals
+
+    @property
+    def solved(self):
+        return self.status == 'solved'
+
+    @property
+    def pushes(self):
+        return sum(1 for char in self.solution if char.isupper()) if self.solution else 0
+
+    @property
+    def moves(self):
+        return len(self.solution) if self.solution else 0
+
+    def __str__(self):
+        return (f"{self.status} poussées={self.pushes} pas={self.moves} "
+                f"nœuds={self.nodes} temps={self.seconds:.2f}s "
+                f"élagués(gel={self.prunedFreeze}, corral={self.prunedCorral})")
+
+
+"""
+AStarSolver : recherche A* sur les poussées (optimale en nombre de poussées).
+    Les doublons sont éliminés au moment du développement : un état dont la clé de Zobrist
+    est déjà dans #closed n'est pas redéveloppé.
+    Avec deadlocks=True, chaque poussée est suivie d'un test de gel autour de la caisse poussée
+    et, au développement, les poussées sont restreintes à un PI-corral touchant cette caisse (si
+    #corrals est vrai : cette restriction ne préserve que l'optimalité en nombre de poussées).
+    Avec matching=True, l'heuristique est l'affectation minimale caisses -> objectifs : elle est
+    calculée complètement au développement d'un état, puis mise à jour en O(n²) pour chaque enfant.
+    Sinon, c'est la somme des distances à l'objectif le plus proche.
+    Avec macros=True (option, désactivée par défaut), les poussées dans un tunnel ou vers une salle
+    d'objectifs sont prolongées en macro-poussées (SokobanProblem.macroPush), de coût égal à leur nombre
+    de poussées : le facteur de branchement diminue, mais l'optimalité en poussées n'est plus garantie.
+    Avec weight > 1 (A* pondéré, f = g + weight * h), la recherche est plus rapide mais la solution
+    n'est plus optimale. Les états dont g + h atteint #bound (nombre de poussées d'une solution déjà
+    connue) sont élagués : la recherche ne trouve alors que des solutions plus courtes, et rend 'bounded'
+    au lieu de 'unsolvable' si elle n'en trouve pas.
+    Avec un SolverMetrics #metrics, la recherche relève sa progression et chronomètre ses phases.
+"""
+class AStarSolver(object):
+    def __init__(self, problem, timeLimit=None, maxNodes=None, deadlocks=True, matching=True, macros=False,
+                 weight=1, metrics=None):
+        self.problem = problem
+        self.timeLimit = timeLimit  # en secondes, None : pas de limite
+        self.maxNodes = maxNodes  # None : pas de limite
+        self.detector = DeadlockDetector(problem) if deadlocks else None
+        self.corrals = deadlocks  # restriction des poussées aux PI-corrals
+        self.matcher = MatchingHeuristic(problem) if matching else None
+        self.macros = macros
+        self.weight = weight
+        self.bound = INFINITY
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.detector = self.detector
+
+    def result(self, status, solution=None, nodes=0, seconds=0.0):
+        detector = self.detector
+        if detector is None:
+            return SolverResult(status, solution, nodes, seconds)
+        return SolverResult(status, solution, nodes, seconds, detector.prunedFreeze, detector.prunedCorral)
+
+    def solve(self):
+        problem = self.problem
+        start = time.perf_counter()
+        deadline = start + self.timeLimit if self.timeLimit is not None else None
+        maxNodes = self.maxNodes
+        weight = self.weight
+        bound = self.bound
+        metrics = self.metrics
+        boxes = problem.startBoxes
+        h = self.heuristic(boxes)
+        if h >= INFINITY:
+            return self.result('unsolvable', seconds=time.perf_counter() - start)
+        if h >= bound:
+            return self.result('bounded', seconds=time.perf_counter() - start)
+        bounded = False  # vrai si un état a été élagué par la borne
+        counter = 0
+        # (f, h, compteur, g, caisses, hash des caisses, joueur, clé du parent, poussée)
+        openList = [(weight * h, h, counter, 0, boxes, problem.boxesHash(boxes), problem.startMover, None, None)]
+        closed = {}  # clé -> (clé du parent, poussée)
+        nodes = 0
+        try:
+            while openList:
+                f, h, _, g, boxes, boxesHash, mover, parentKey, push = heapq.heappop(openList)
+                if metrics is not None:
+                    since = time.perf_counter()
+                marks, region = problem.reach(boxes, mover)
+                if metrics is not None:
+                    metrics.lap('reach', since)
+                key = problem.stateKey(boxesHash, region)
+                if key in closed:
+                    continue
+                closed[key] = (parentKey, push)
+                if problem.isSolved(boxes):
+                    solution = problem.solutionFromPushes(self.pushesTo(closed, key))
+                    return self.result('solved', solution, nodes, time.perf_counter() - start)
+                nodes += 1
+                if maxNodes is not None and nodes >= maxNodes:
+                    return self.result('limit', nodes=nodes, seconds=time.perf_counter() - start)
+                if nodes & 255 == 0:
+                    if deadline is not None and time.perf_counter() > deadline:
+                        return self.result('timeout', nodes=nodes, seconds=time.perf_counter() - start)
+                    if metrics is not None:
+                        metrics.sample(nodes, len(openList), len(closed))
+                boxKeys = problem.zobrist.boxKeys
+                for childH, cost, box, target, childBoxes, childMover, childPush in self.children(
+                        boxes, marks, push, h):
+                    if g + cost + childH >= bound:
+                        bounded = True
+                        continue
+                    counter += 1
+                    heapq.heappush(openList, (g + cost + weight * childH, childH, counter, g + cost, childBoxes,
+                                              boxesHash ^ boxKeys[box] ^ boxKeys[target], childMover, key,
+                                              childPush))
+            status = 'bounded' if bounded else 'unsolvable'
+            return self.result(status, nodes=nodes, seconds=time.perf_counter() - start)
+        finally:
+            if metrics is not None:
+                metrics.setSizes(len(openList), len(closed))
+
+    def heuristic(self, boxes):
+        """Minorant du nombre de poussées restantes (INFINITY si aucune affectation n'est possible)."""
+        matcher = self.matcher
+        return matcher.solve(boxes).value if matcher is not None else self.problem.heuristic(boxes)
+
+    def children(self, boxes, marks, push, h):
+        """
+        Enfants non élagués d'un état de minorant #h dont la zone du joueur est #marks
+        (#push : poussée qui a mené à cet état, None pour l'état initial).
+        Retourne une liste de (minorant, nombre de poussées, caisse poussée, case d'arrivée finale,
+        caisses de l'enfant, case du joueur, poussée ou macro-poussée).
+        """
+        problem = self.problem
+        detector = self.detector
+        matcher = self.matcher
+        macros = self.macros
+        metrics = self.metrics
+        minDistance = problem.minDistance
+        if metrics is not None:
+            since = time.perf_counter()
+        pushes = problem.pushes(boxes, marks)
+        if metrics is not None:
+            since = metrics.lap('moves', since)
+        if detector is not None and self.corrals and push is not None:
+            pushes = detector.corralPushes(boxes, marks, push[1], pushes)
+        if metrics is not None:
+            since = metrics.lap('deadlocks', since)
+        matching = matcher.solve(boxes) if matcher is not None else None
+        if metrics is not None:
+            metrics.lap('heuristic', since)
+        children = []
+        for box, target in pushes:
+            if metrics is not None:
+                since = time.perf_counter()
+            if macros:
+                target, childPush, childMover, cost = problem.macroPush(boxes, box, target)
+            else:
+                childPush, childMover, cost = (box, target), box, 1
+            childBoxes = boxes - {box} | {target}
+            if metrics is not None:
+                since = metrics.lap('moves', since)
+            frozen = detector is not None and detector.isFrozenDeadlock(childBoxes, target)
+            if metrics is not None:
+                since = metrics.lap('deadlocks', since)
+            if frozen:
+                continue
+            if matching is not None:
+                childH = matcher.update(matching, box, target).value
+            else:
+                childH = h - minDistance[box] + minDistance[target]
+            if metrics is not None:
+                metrics.lap('heuristic', since)
+            if childH >= INFINITY:
+                continue  # aucune affectation possible : impasse
+            children.append((childH, cost, box, target, childBoxes, childMover, childPush))
+        return children
+
+    @staticmethod
+    def pushesTo(closed, key):
+        """Suite des poussées menant de l'état initial à l'état #key."""
+        pushes = []
+        parentKey, push = closed[key]
+        while push is not None:
+            pushes.append(push)
+            parentKey, push = closed[parentKey]
+        pushes.reverse()
+        return pushes
+
+
+"""
+BidirectionalSolver : recherche bidirectionnelle, en poussant depuis l'état initial et en tirant
+    depuis l'état final (toutes les caisses sur les objectifs, une recherche par zone possible du joueur).
+    Un état arrière est de même forme qu'un état avant (caisses + zone normalisée du joueur) : les deux
+    recherches se rejoignent dès qu'un état est fermé des deux côtés. À chaque itération, on développe
+    un état du côté dont la liste ouverte est la plus petite.
+    Une traction inverse une poussée : tirer une caisse de b vers p (joueur de p vers p + (p - b)) est
+    la poussée de p vers b. La solution est donc la suite des poussées avant suivie des tractions
+    arrière inversées, rendue au format LURD comme pour AStarSolver.
+    L'arrière est guidé par l'affectation minimale des caisses aux positions de départ (distances en
+    poussées depuis chaque position de départ, sokobanAnalyse.pushDistances).
+    La solution n'est pas garantie optimale en nombre de poussées. Si le niveau n'a pas autant
+    d'objectifs que de caisses, l'état final n'est pas unique : la recherche est confiée à AStarSolver.
+"""
+class BidirectionalSolver(object):
+    def __init__(self, problem, timeLimit=None, maxNodes=None, deadlocks=True, matching=True, macros=False,
+                 metrics=None):
+        self.problem = problem
+        self.timeLimit = timeLimit  # en secondes, None : pas de limite
+        self.maxNodes = maxNodes  # None : pas de limite
+        self.metrics = metrics
+        self.forward = AStarSolver(problem, timeLimit, maxNodes, deadlocks, matching, macros, metrics=metrics)
+        starts = problem.startBoxes
+        self.backward = MatchingHeuristic(problem, starts,
+                                          {start: pushDistances(problem.board, start) for start in starts})
+
+    def solve(self):
+        problem = self.problem
+        forward = self.forward
+        backward = self.backward
+        goals = problem.goals
+        if len(goals) != len(problem.startBoxes):
+            return forward.solve()
+        start = time.perf_counter()
+        deadline = start + self.timeLimit if self.timeLimit is not None else None
+        maxNodes = self.maxNodes
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.stage = 'bidirectional'
+        static = problem.static
+        steps = problem.steps
+        boxKeys = problem.zobrist.boxKeys
+        h = forward.heuristic(problem.startBoxes)
+        backH = backward.solve(goals).value
+        if h >= INFINITY or backH >= INFINITY:
+            return forward.result('unsolvable', seconds=time.perf_counter() - start)
+        counter = 0
+        # Même forme d'entrée que pour AStarSolver ; la "poussée" d'un état arrière est une traction
+        forwardOpen = [(h, h, counter, 0, problem.startBoxes, problem.boxesHash(problem.startBoxes),
+                        problem.startMover, None, None)]
+        backwardOpen = []
+        goalsHash = problem.boxesHash(goals)
+        for mover in self.finalMovers():
+            counter += 1
+            backwardOpen.append((backH, backH, counter, 0, goals, goalsHash, mover, None, None))
+        forwardClosed = {}  # clé -> (clé du parent, poussée)
+        backwardClosed = {}  # clé -> (clé du parent, traction)
+        nodes = 0
+        try:
+            while forwardOpen and backwardOpen:
+                if len(forwardOpen) <= len(backwardOpen):
+                    f, h, _, g, boxes, boxesHash, mover, parentKey, push = heapq.heappop(forwardOpen)
+                    marks, region = problem.reach(boxes, mover)
+                    key = problem.stateKey(boxesHash, region)
+                    if key in forwardClosed:
+                        continue
+                    forwardClosed[key] = (parentKey, push)
+                    if key in backwardClosed or problem.isSolved(boxes):
+                        return self.meet(forwardClosed, backwardClosed, key, nodes, start)
+                    for childH, cost, box, target, childBoxes, childMover, childPush in forward.children(
+                            boxes, marks, push, h):
+                        counter += 1
+                        heapq.heappush(forwardOpen, (g + cost + childH, childH, counter, g + cost, childBoxes,
+                                                     boxesHash ^ boxKeys[box] ^ boxKeys[target], childMover, key,
+                                                     childPush))
+                else:
+                    f, h, _, g, boxes, boxesHash, mover, parentKey, pull = heapq.heappop(backwardOpen)
+                    marks, region = problem.reach(boxes, mover)
+                    key = problem.stateKey(boxesHash, region)
+                    if key in backwardClosed:
+                        continue
+                    backwardClosed[key] = (parentKey, pull)
+                    if key in forwardClosed:
+                        return self.meet(forwardClosed, backwardClosed, key, nodes, start)
+                    matching = backward.solve(boxes)
+                    for box in boxes:
+                        for step in steps:
+                            # Joueur en box + step, qui recule en box + 2 * step en tirant la caisse en box + step
+                            target = box + step
+                            behind = target + step
+                            if not marks[target] or static[behind] >= WALL or behind in boxes:
+                                continue
+                            childH = backward.update(matching, box, target).value
+                            if childH >= INFINITY:
+                                continue  # les caisses ne peuvent plus rejoindre leurs positions de départ
+                            counter += 1
+                            heapq.heappush(backwardOpen, (g + 1 + childH, childH, counter, g + 1,
+                                                          boxes - {box} | {target},
+                                                          boxesHash ^ boxKeys[box] ^ boxKeys[target], behind, key,
+                                                          (box, target)))
+                nodes += 1
+                if maxNodes is not None and nodes >= maxNodes:
+                    return forward.result('limit', nodes=nodes, seconds=time.perf_counter() - start)
+                if nodes & 255 == 0:
+                    if deadline is not None and time.perf_counter() > deadline:
+                        return forward.result('timeout', nodes=nodes, seconds=time.perf_counter() - start)
+                    if metrics is not None:
+                        metrics.sample(nodes, len(forwardOpen) + len(backwardOpen),
+                                       len(forwardClosed) + len(backwardClosed))
+            return forward.result('unsolvable', nodes=nodes, seconds=time.perf_counter() - start)
+        finally:
+            if metrics is not None:
+                metrics.setSizes(len(forwardOpen) + len(backwardOpen), len(forwardClosed) + len(backwardClosed))
+
+    def finalMovers(self):
+        """Une case par zone possible du joueur dans l'état final (zone touchant au moins une caisse)."""
+        problem = self.problem
+        goals = problem.goals
+        seen = bytearray(problem.size)
+        movers = []
+        for index in range(problem.size):
+            if problem.static[index] < WALL and index not in goals and not seen[index]:
+                marks, _ = problem.reach(goals, index)
+                for cell, mark in enumerate(marks):
+                    if mark:
+                        seen[cell] = 1
+                if any(marks[goal + step] for goal in goals for step in problem.steps):
+                    movers.append(index)
+        return movers
+
+    def meet(self, forwardClosed, backwardClosed, key, nodes, start):
+        """Solution passant par l'état #key, fermé dans les deux recherches (ou état final atteint en avant)."""
+        pushes = AStarSolver.pushesTo(forwardClosed, key)
+        if key in backwardClosed:
+            pulls = AStarSolver.pushesTo(backwardClosed, key)
+            pushes.extend((target, box) for box, target in reversed(pulls))
+        solution = self.problem.solutionFromPushes(pushes)
+        return self.forward.result('solved', solution, nodes, time.perf_counter() - start)
+
+
+"""
+IDAStarSolver : recherche IDA* sur les poussées, en mémoire bornée (optimale en nombre de poussées,
+    sauf avec macros=True, voir AStarSolver).
+    Parcours en profondeur itéré sur le seuil de f = g + h ; le seul état conservé hors de la pile est
+    une table de transposition de taille fixe (#tableMemory Mo), où chaque entrée est remplacée en
+    cas de collision. Une entrée (clé, g, itération) élague un état déjà atteint pendant l'itération
+    courante avec un g inférieur ou égal. Perdre une entrée ne fait que refaire du travail : la
+    mémoire utilisée ne dépend pas de la taille de l'espace d'états.
+"""
+class IDAStarSolver(object):
+    def __init__(self, problem, timeLimit=None, maxNodes=None, deadlocks=True, matching=True, macros=False,
+                 tableMemory=DEFAULT_TABLE_MEMORY, metrics=None):
+        self.problem = problem
+        self.timeLimit = timeLimit  # en secondes, None : pas de limite
+        self.maxNodes = maxNodes  # None : pas de limite
+        self.metrics = metrics
+        self.search = AStarSolver(problem, timeLimit, maxNodes, deadlocks, matching, macros, metrics=metrics)
+        self.slots = max(1, tableMemory * 1024 * 1024 // TABLE_ENTRY_BYTES)
+
+    def solve(self):
+        problem = self.problem
+        search = self.search
+        start = time.perf_counter()
+        deadline = start + self.timeLimit if self.timeLimit is not None else None
+        maxNodes = self.maxNodes
+        metrics = self.metrics
+        boxKeys = problem.zobrist.boxKeys
+        slots = self.slots
+        filled = 0  # entrées occupées de la table
+        tableKeys = array('Q', [0]) * slots
+        tableDepths = array('H', [0]) * slots
+        tableRounds = array('H', [0]) * slots  # itération de l'entrée (0 : vide)
+        boxes = problem.startBoxes
+        h = search.heuristic(boxes)
+        if h >= INFINITY:
+            return search.result('unsolvable', seconds=time.perf_counter() - start)
+        bound = h
+        nodes = 0
+        iteration = 0
+        stack = []  # pile de l'itération en cours
+        try:
+            while True:
+                iteration += 1
+                if metrics is not None:
+                    metrics.stage = f'ida {bound}'
+                nextBound = INFINITY
+                pushes = []  # poussées du chemin courant
+                pathKeys = set()  # clés des états du chemin courant (la pile garde leur ordre)
+                # Pile de (enfants restants, g, hash des caisses, caisses, clé) ;
+                # le premier état est traité à part
+                stack = []
+                state = (0, h, boxes, problem.boxesHash(boxes), problem.startMover, None)
+                while True:
+                    if state is not None:
+                        g, h, boxes, boxesHash, mover, push = state
+                        state = None
+                        f = g + h
+                        if f > bound:
+                            nextBound = min(nextBound, f)
+                        else:
+                            if metrics is not None:
+                                since = time.perf_counter()
+                            marks, region = problem.reach(boxes, mover)
+                            if metrics is not None:
+                                metrics.lap('reach', since)
+                            key = problem.stateKey(boxesHash, region)
+                            slot = key % slots
+                            if key in pathKeys or (tableKeys[slot] == key and tableRounds[slot] == iteration
+                                                   and tableDepths[slot] <= g):
+                                pass  # cycle, ou état déjà atteint à moindre coût pendant cette itération
+                            elif problem.isSolved(boxes):
+                                if push is not None:
+                                    pushes.append(push)
+                                solution = problem.solutionFromPushes(pushes)
+                                return search.result('solved', solution, nodes, time.perf_counter() - start)
+                            else:
+                                filled += tableRounds[slot] == 0
+                                tableKeys[slot] = key
+                                tableDepths[slot] = g
+                                tableRounds[slot] = iteration
+                                nodes += 1
+                                if maxNodes is not None and nodes >= maxNodes:
+                                    return search.result('limit', nodes=nodes, seconds=time.perf_counter() - start)
+                                if nodes & 255 == 0:
+                                    if deadline is not None and time.perf_counter() > deadline:
+                                        return search.result('timeout', nodes=nodes,
+                                                             seconds=time.perf_counter() - start)
+                                    if metrics is not None:
+                                        metrics.sample(nodes, len(stack), filled)
+                                children = sorted(search.children(boxes, marks, push, h), reverse=True)
+                                if push is not None:
+                                    pushes.append(push)
+                                pathKeys.add(key)
+                                stack.append((children, g, boxesHash, boxes, key))
+                    if not stack:
+                        break
+                    children, g, boxesHash, boxes, key = stack[-1]
+                    if children:
+                        # Meilleur minorant d'abord (enfants triés par ordre décroissant)
+                        childH, cost, box, target, childBoxes, childMover, childPush = children.pop()
+                        state = (g + cost, childH, childBoxes, boxesHash ^ boxKeys[box] ^ boxKeys[target],
+                                 childMover, childPush)
+                    else:
+                        pathKeys.discard(stack.pop()[4])
+                        if stack:
+                            pushes.pop()
+                if nextBound >= INFINITY:
+                    return search.result('unsolvable', nodes=nodes, seconds=time.perf_counter() - start)
+                bound = nextBound
+        finally:
+            if metrics is not None:
+                metrics.setSizes(len(stack), filled)
+
+
+"""
+AnytimeSolver : recherche "anytime", qui rend vite une première solution puis l'améliore tant que le
+    budget de temps (#timeLimit, pour l'ensemble des phases) et de nœuds le permet :
+    1. A* pondéré avec des poids décroissants (WEIGHTS), chaque passe ne cherchant qu'une solution
+       plus courte en poussées que la meilleure connue (avec macros=True, les passes pondérées utilisent
+       les macro-poussées) ; la dernière passe (poids 1, sans macro-poussée) prouve l'optimalité en
+       poussées si elle va jusqu'au bout. Seule une passe sans macro-poussée peut conclure qu'il n'y a
+       pas de solution ;
+    2. recherche de la solution la plus courte en pas parmi celles qui n'ont pas plus de poussées :
+       A* sur (poussées, pas), où un état retient la case exacte du joueur et non plus sa zone.
+    Chaque solution meilleure que la précédente (moins de poussées, ou autant de poussées et moins de
+    pas) est produite par #solutions et passée à #onSolution ; l'appelant peut s'arrêter à tout moment.
+"""
+class AnytimeSolver(object):
+    WEIGHTS = (5, 3, 2, 1.5, 1)
+
+    def __init__(self, problem, timeLimit=None, maxNodes=None, deadlocks=True, matching=True, macros=False,
+                 onSolution=None, metrics=None):
+        self.problem = problem
+        self.timeLimit = timeLimit  # en secondes, None : pas de limite
+        self.maxNodes = maxNodes  # None : pas de limite
+        self.deadlocks = deadlocks
+        self.matching = matching
+        self.macros = macros
+        self.onSolution = onSolution  # fonction appelée avec chaque SolverResult amélioré
+        self.metrics = metrics  # SolverMetrics partagé par toutes les passes
+        self.failure = SolverResult('unsolvable')  # résultat rendu si aucune solution n'est trouvée
+
+    def solve(self):
+        """Meilleure solution trouvée dans le budget (ou l'échec de la première passe)."""
+        best = None
+        for best in self.solutions():
+            if self.onSolution is not None:
+                self.onSolution(best)
+        return best if best is not None else self.failure
+
+    def solutions(self):
+        """Générateur des solutions successives, chacune meilleure que la précédente."""
+        problem = self.problem
+        start = time.perf_counter()
+        deadline = start + self.timeLimit if self.timeLimit is not None else None
+        metrics = self.metrics
+        nodes = prunedFreeze = prunedCorral = 0  # totaux des passes déjà faites
+        best = None
+        for weight in self.WEIGHTS:
+            remaining = self.remaining(deadline, nodes)
+            if remaining is None:
+                return
+            timeLimit, maxNodes = remaining
+            if metrics is not None:
+                metrics.stage = f'weight {weight}'
+                metrics.nodesOffset = nodes
+            macros = self.macros and weight != 1
+            search = AStarSolver(problem, timeLimit, maxNodes, self.deadlocks, self.matching, macros, weight,
+                                 metrics)
+            if best is not None:
+                search.bound = best.pushes
+            result = search.solve()
+            nodes += result.nodes
+            prunedFreeze += result.prunedFreeze
+            prunedCorral += result.prunedCorral
+            result.nodes, result.prunedFreeze, result.prunedCorral = nodes, prunedFreeze, prunedCorral
+            result.seconds = time.perf_counter() - start
+            if result.solved:
+                best = result
+                yield best
+            elif best is None:
+                self.failure = result
+                if result.status == 'unsolvable' and not macros:
+                    return  # même sans borne, l'espace d'états est épuisé
+                # avec les macro-poussées, la recherche n'est pas complète : on passe au poids suivant
+        if best is None:
+            return
+        remaining = self.remaining(deadline, nodes)
+        if remaining is None:
+            return
+        timeLimit, maxNodes = remaining
+        if metrics is not None:
+            metrics.stage = 'moves'
+            metrics.nodesOffset = nodes
+        result = self.improveMoves(best, timeLimit, maxNodes)
+        result.nodes += nodes
+        result.prunedFreeze += prunedFreeze
+        result.prunedCorral += prunedCorral
+        result.seconds = time.perf_counter() - start
+        if result.solved and (result.pushes, result.moves) < (best.pushes, best.moves):
+            yield result
+
+    def remaining(self, deadline, nodes):
+        """(temps, nœuds) restants pour la passe suivante, None si le budget est épuisé."""
+        timeLimit = maxNodes = None
+        if deadline is not None:
+            timeLimit = deadline - time.perf_counter()
+            if timeLimit <= 0:
+                return None
+        if self.maxNodes is not None:
+            maxNodes = self.maxNodes - nodes
+            if maxNodes <= 0:
+                return None
+        return timeLimit, maxNodes
+
+    def improveMoves(self, best, timeLimit, maxNodes):
+        """
+        A* lexicographique sur (poussées, pas) : solution la plus courte en pas parmi celles qui ont au
+        plus best.pushes poussées. Le minorant h en poussées minore aussi les pas restants.
+        Seul le test de gel élague les poussées : la restriction aux PI-corrals peut écarter la
+        solution la plus courte en pas.
+        Retourne 'bounded' si aucune solution n'est meilleure que #best.
+        """
+        problem = self.problem
+        search = AStarSolver(problem, deadlocks=self.deadlocks, matching=self.matching, macros=False,
+                             metrics=self.metrics)
+        search.corrals = False
+        metrics = self.metrics
+        start = time.perf_counter()
+        deadline = start + timeLimit if timeLimit is not None else None
+        bound = (best.pushes, best.moves)
+        boxKeys = problem.zobrist.boxKeys
+        moverKeys = problem.zobrist.moverKeys
+        boxes = problem.startBoxes
+        h = search.heuristic(boxes)
+        counter = 0
+        # ((poussées + h, pas + h), compteur, h, poussées, pas, caisses, hash des caisses, joueur,
+        #  clé du parent, poussée)
+        openList = [((h, h), counter, h, 0, 0, boxes, problem.boxesHash(boxes), problem.startMover, None, None)]
+        closed = {}  # clé (caisses + case exacte du joueur) -> (clé du parent, poussée)
+        bounded = False  # vrai si un état a été élagué par la borne
+        nodes = 0
+        try:
+            while openList:
+                _, _, h, pushes, moves, boxes, boxesHash, mover, parentKey, push = heapq.heappop(openList)
+                key = boxesHash ^ moverKeys[mover]
+                if key in closed:
+                    continue
+                closed[key] = (parentKey, push)
+                if problem.isSolved(boxes):
+                    solution = problem.solutionFromPushes(AStarSolver.pushesTo(closed, key))
+                    return search.result('solved', solution, nodes, time.perf_counter() - start)
+                nodes += 1
+                if maxNodes is not None and nodes >= maxNodes:
+                    return search.result('limit', nodes=nodes, seconds=time.perf_counter() - start)
+                if nodes & 255 == 0:
+                    if deadline is not None and time.perf_counter() > deadline:
+                        return search.result('timeout', nodes=nodes, seconds=time.perf_counter() - start)
+                    if metrics is not None:
+                        metrics.sample(nodes, len(openList), len(closed))
+                if metrics is not None:
+                    since = time.perf_counter()
+                distances, marks = problem.walkDistances(boxes, mover)
+                if metrics is not None:
+                    metrics.lap('reach', since)
+                for childH, _, box, target, childBoxes, childMover, childPush in search.children(
+                        boxes, marks, push, h):
+                    childPushes = pushes + 1
+                    childMoves = moves + distances[2 * box - target] + 1
+                    priority = (childPushes + childH, childMoves + childH)
+                    if priority >= bound:
+                        bounded = True
+                        continue  # pas mieux que la meilleure solution connue
+                    counter += 1
+                    heapq.heappush(openList, (priority, counter, childH, childPushes, childMoves, childBoxes,
+                                              boxesHash ^ boxKeys[box] ^ boxKeys[target], childMover, key,
+                                              childPush))
+            status = 'bounded' if bounded else 'unsolvable'
+            return search.result(status, nodes=nodes, seconds=time.perf_counter() - start)
+        finally:
+            if metrics is not None:
+                metrics.setSizes(len(openList), len(closed))
+
+
+# Modes de recherche de #solve ; le mode 'external' (sokobanExternal.ExternalSolver) n'est importé que
+# par #solve, sokobanExternal important ce module
+SOLVERS = {'astar': AStarSolver, 'bidirectional': BidirectionalSolver, 'ida': IDAStarSolver,
+           'anytime': AnytimeSolver, 'external': None}
+
+
+def solve(xsbMatrix, timeLimit=None, maxNodes=None, deadlocks=True, matching=True, mode='astar',
+          tableMemory=DEFAULT_TABLE_MEMORY, macros=False, onSolution=None, onMetrics=None):
+    """
+    Résout un niveau (matrice xsb) avec le solveur du mode #mode (voir SOLVERS) ;
+    retourne un SolverResult dont la solution est vérifiée.
+    En mode 'anytime', #onSolution est appelée avec chaque solution améliorée.
+    #tableMemory : taille en Mo de la table de transposition (mode 'ida') ou du tampon des enfants
+    (mode 'external').
+    #onMetrics est appelée avec les relevés de progression (voir sokobanMetrics), dont un dernier à la fin.
+    """
+    metrics = SolverMetrics(onMetrics) if onMetrics is not None else None
+    problem = SokobanProblem(xsbMatrix)
+    if len(problem.startBoxes) > len(problem.goals):
+        result = SolverResult('unsolvable')  # pas assez d'objectifs pour toutes les caisses
+        if metrics is not None:
+            metrics.report(result.status, result.nodes)
+        return result
+    if mode == 'ida':
+        solver = IDAStarSolver(problem, timeLimit, maxNodes, deadlocks, matching, macros, tableMemory, metrics)
+    elif mode == 'anytime':
+        solver = AnytimeSolver(problem, timeLimit, maxNodes, deadlocks, matching, macros, onSolution, metrics)
+    elif mode == 'astar':
+        solver = AStarSolver(problem, timeLimit, maxNodes, deadlocks, matching, macros, metrics=metrics)
+    elif mode == 'external':
+        from sokobanExternal import ExternalSolver
+        solver = ExternalSolver(problem, timeLimit, maxNodes, deadlocks, matching, tableMemory, metrics=metrics)
+    else:
+        solver = SOLVERS[mode](problem, timeLimit, maxNodes, deadlocks, matching, macros, metrics)
+    result = solver.solve()
+    if metrics is not None:
+        metrics.report(result.status, result.nodes)
+    if result.solved and not problem.checkSolution(result.solution, xsbMatrix):
+        raise AssertionError("La solution trouvée ne résout pas le niveau")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Résout des niveaux de Sokoban (A* sur les poussées).")
+    parser.add_argument('levels', nargs='*', type=int, help="numéros de niveaux (à partir de 1), tous par défaut")
+    parser.add_argument('--file', help="collection de niveaux au format texte (ex. levels.txt)")
+    parser.add_argument('--time', type=float, default=60.0, help="limite de temps par niveau, en secondes")
+    parser.add_argument('--nodes', type=int, default=None, help="limite de nœuds par niveau")
+    parser.add_argument('--no-deadlocks', action='store_true', help="désactive les tests de gel et de PI-corral")
+    parser.add_argument('--nearest', action='store_true',
+                        help="heuristique de l'objectif le plus proche au lieu de l'affectation minimale")
+    parser.add_argument('--macros', action='store_true',
+                        help="macro-poussées (tunnels et salles d'objectifs) : plus rapide, mais la solution "
+                             "n'est plus garantie optimale en poussées")
+    parser.add_argument('--mode', choices=sorted(SOLVERS), default='astar',
+                        help="astar (défaut), bidirectional (poussées/tractions, non garanti optimal), "
+                             "ida (IDA*, mémoire bornée), anytime (solutions de plus en plus courtes) "
+                             "ou external (largeur, couches sur le disque, sans macro-poussée)")
+    parser.add_argument('--table-memory', type=int, default=DEFAULT_TABLE_MEMORY,
+                        help="taille de la table de transposition du mode ida, ou du tampon du mode external, "
+                             "en Mo")
+    parser.add_argument('--profile', metavar='FICHIER',
+                        help="écrit les relevés de progression (sokobanMetrics) au format JSON Lines")
+    args = parser.parse_args()
+
+    collection = readXsbLevels(args.file) if args.file else SokobanXSBLevels
+    numbers = args.levels or range(1, len(collection) + 1)
+    solved = 0
+    profile = open(args.profile, 'w') if args.profile else None
+
+    def improved(result):
+        print(f"  amélioration : poussées={result.pushes} pas={result.moves} temps={result.seconds:.2f}s")
+
+    for number in numbers:
+        onMetrics = None
+        if profile is not None:
+            def onMetrics(record, number=number):
+                profile.write(json.dumps(dict(level=number, mode=args.mode, **record)) + '\n')
+                profile.flush()
+        result = solve(collection[number - 1], args.time, args.nodes, not args.no_deadlocks, not args.nearest,
+                       args.mode, args.table_memory, args.macros, improved, onMetrics)
+        solved += result.solved
+        print(f"Niveau {number} : {result}")
+        if result.solved:
+            print(f"  {result.solution}")
+    if profile is not None:
+        profile.close()
+    print(f"{solved}/{len(numbers)} niveaux résolus")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,25 @@ def xsbMatrix(matrix):
         xsbMat.append(s)
     return xsbMat
 
+def readXsbLevels(fileName):
+    # Lit une collection de niveaux au format texte (ex. levels.txt) :
+    #   les lignes de plateau sont faites de '#', '$', '.', '*', '@', '+', '-' et ' ',
+    #   toute autre ligne (titre "Level 1", commentaire, ligne vide) sépare deux niveaux.
+    # Retourne la liste des matrices xsb (même format que SokobanXSBLevels)
+    levels = []
+    current = []
+    with open(fileName, "r") as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line.strip() != '' and all(c in '#$.*@+- _' for c in line):
+                current.append([' ' if c == '_' else c for c in line])
+            elif current:
+                levels.append(current)
+                current = []
+    if current:
+        levels.append(current)
+    return levels
+
 def printXsbMatrix(matrix):
     l=0
     for line in matrix:
@@ -1410,6 +1429,3 @@ SokobanXSBLevels = [
         [' ', ' ', ' ', ' ', ' ', ' ', '#', '#', '#', '#', '#', '#', '#', '#', '#', '#', '#', '#', '#'],
     ],
 ]
-
-
-print(SokobanXSBLevels[99])
\ No newline at end of file
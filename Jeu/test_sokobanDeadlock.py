@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Vérification des tests d'impasse (sokobanDeadlock) : ils ne doivent écarter aucune solution optimale.
+A* avec et sans élagage (gel et PI-corrals) doit rendre le même statut et le même nombre de poussées
+sur les niveaux de SokobanXSBLevels.
+
+Niveaux 1 à 38 (quelques secondes, dont le niveau 11, déclaré sans solution par une ancienne
+restriction aux PI-corrals) ; toute la collection, avec une limite de nœuds, seulement si la
+variable d'environnement SOKOBAN_LONG_TESTS est définie (une dizaine de minutes). Un niveau pour
+lequel l'une des deux recherches atteint la limite n'est pas comparé.
+
+Usage :
+    python -m unittest test_sokobanDeadlock
+    SOKOBAN_LONG_TESTS=1 python -m unittest test_sokobanDeadlock
+"""
+import os
+import unittest
+
+from sokobanSolver import solve
+from sokobanXSBLevels import SokobanXSBLevels
+
+QUICK_LEVELS = range(1, 39)
+QUICK_NODES = 200000
+LONG_NODES = 20000  # par niveau et par recherche, sur toute la collection
+
+
+class DeadlockPruningTest(unittest.TestCase):
+    def check(self, numbers, maxNodes):
+        compared = 0
+        for number in numbers:
+            with self.subTest(level=number):
+                xsbMatrix = SokobanXSBLevels[number - 1]
+                pruned = solve(xsbMatrix, maxNodes=maxNodes)
+                full = solve(xsbMatrix, maxNodes=maxNodes, deadlocks=False)
+                if 'limit' in (pruned.status, full.status):
+                    continue
+                compared += 1
+                self.assertEqual((pruned.status, pruned.pushes), (full.status, full.pushes))
+        return compared
+
+    def testQuickLevels(self):
+        self.assertEqual(self.check(QUICK_LEVELS, QUICK_NODES), len(QUICK_LEVELS))
+
+    def testLevel11(self):
+        result = solve(SokobanXSBLevels[10])
+        self.assertEqual((result.status, result.pushes), ('solved', 15))
+
+    @unittest.skipUnless(os.environ.get('SOKOBAN_LONG_TESTS'), "SOKOBAN_LONG_TESTS non définie")
+    def testAllLevels(self):
+        self.check(range(1, len(SokobanXSBLevels) + 1), LONG_NODES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Vérification du mode 'external' (sokobanExternal.ExternalSolver, recherche en largeur sur le disque)
+contre A* sans macro-poussée : les deux sont optimaux en poussées, leurs solutions doivent avoir le
+même nombre de poussées.
+
+Niveaux de levels.txt : 2, 3 et 4 (quelques secondes) ; 6 et 7 (une à deux minutes) seulement si
+la variable d'environnement SOKOBAN_LONG_TESTS est définie. Le niveau 5 n'est pas vérifié : aucun
+des deux solveurs ne le résout en quelques minutes.
+
+Usage :
+    python -m unittest test_sokobanExternal
+    SOKOBAN_LONG_TESTS=1 python -m unittest test_sokobanExternal
+"""
+import os
+import unittest
+
+from sokobanSolver import solve
+from sokobanXSBLevels import readXsbLevels
+
+LEVELS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'levels.txt')
+QUICK_LEVELS = (2, 3, 4)
+LONG_LEVELS = (6, 7)
+TIME_LIMIT = 300.0  # par niveau et par solveur, en secondes
+
+
+class ExternalSolverTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.collection = readXsbLevels(LEVELS_FILE)
+
+    def check(self, numbers):
+        for number in numbers:
+            with self.subTest(level=number):
+                xsbMatrix = self.collection[number - 1]
+                expected = solve(xsbMatrix, TIME_LIMIT, mode='astar', macros=False)
+                self.assertEqual(expected.status, 'solved')
+                result = solve(xsbMatrix, TIME_LIMIT, mode='external')
+                self.assertEqual(result.status, 'solved')
+                self.assertEqual(result.pushes, expected.pushes)
+
+    def testQuickLevels(self):
+        self.check(QUICK_LEVELS)
+
+    @unittest.skipUnless(os.environ.get('SOKOBAN_LONG_TESTS'), "SOKOBAN_LONG_TESTS non définie")
+    def testLongLevels(self):
+        self.check(LONG_LEVELS)
+
+    def testMetrics(self):
+        records = []
+        result = solve(self.collection[1], TIME_LIMIT, mode='external', onMetrics=records.append)
+        self.assertEqual(records[-1]['status'], result.status)
+        self.assertEqual(records[-1]['nodes'], result.nodes)
+        self.assertGreater(records[-1]['closed'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
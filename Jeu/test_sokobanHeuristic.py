@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Vérification de sokobanHeuristic.MatchingHeuristic contre une affectation par force brute, sur des
+matrices de coûts aléatoires carrées (autant de caisses que d'objectifs) et rectangulaires.
+
+Usage :
+    python -m unittest test_sokobanHeuristic
+"""
+import itertools
+import random
+import unittest
+
+from sokobanBoard import FLOOR, WALL
+from sokobanHeuristic import MatchingHeuristic
+
+CELLS = 8  # cases praticables du problème factice (1 à CELLS ; la case 0 est un mur, comme le bord)
+TRIALS = 2000
+
+
+class FakeProblem(object):
+    """Problème réduit à ce qu'utilise MatchingHeuristic : coûts aléatoires case -> objectif."""
+    def __init__(self, rng, goals, boxes):
+        self.size = CELLS + 1
+        self.static = bytes([WALL]) + bytes([FLOOR]) * CELLS
+        self.goals = frozenset(goals)
+        self.startBoxes = frozenset(boxes)
+        self.distances = {goal: [rng.randrange(20) for _ in range(CELLS + 1)] for goal in goals}
+
+
+def bruteForce(problem, boxes):
+    """Coût minimal d'une affectation des caisses #boxes à des objectifs distincts."""
+    distances = problem.distances
+    return min(sum(distances[goal][box] for box, goal in zip(boxes, goals))
+               for goals in itertools.permutations(sorted(problem.goals), len(boxes)))
+
+
+class MatchingHeuristicTest(unittest.TestCase):
+    def check(self, square):
+        rng = random.Random(1 if square else 2)
+        for _ in range(TRIALS):
+            columns = rng.randint(1, 5)
+            count = columns if square else rng.randint(1, columns)
+            goals = rng.sample(range(1, CELLS + 1), columns)
+            boxes = rng.sample(range(1, CELLS + 1), count)
+            problem = FakeProblem(rng, goals, boxes)
+            heuristic = MatchingHeuristic(problem)
+            matching = heuristic.solve(boxes)
+            self.assertEqual(matching.value, bruteForce(problem, boxes))
+            free = [cell for cell in range(1, CELLS + 1) if cell not in boxes]
+            if not free:
+                continue
+            box = rng.choice(boxes)
+            target = rng.choice(free)
+            moved = [target if cell == box else cell for cell in boxes]
+            self.assertEqual(heuristic.update(matching, box, target).value, bruteForce(problem, moved))
+
+    def testSquare(self):
+        self.check(square=True)
+
+    def testRectangular(self):
+        self.check(square=False)
+
+    def testMoreBoxesThanGoals(self):
+        problem = FakeProblem(random.Random(3), [1, 2], [1, 2])
+        heuristic = MatchingHeuristic(problem)
+        with self.assertRaises(ValueError):
+            heuristic.solve([3, 4, 5])
+        with self.assertRaises(ValueError):
+            MatchingHeuristic(FakeProblem(random.Random(3), [1], [2, 3]))
+
+
+if __name__ == "__main__":
+    unittest.main()
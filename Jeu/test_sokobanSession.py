@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Test d'endurance de l'interface (sokobanSession.longSession) : nombre d'items du canvas constant et
+mémoire bornée pendant une longue partie jouée au hasard.
+
+20 000 touches par défaut ; la partie de 100 000 touches n'est jouée que si la variable
+d'environnement SOKOBAN_LONG_TESTS est définie.
+
+Usage :
+    python -m unittest test_sokobanSession
+    SOKOBAN_LONG_TESTS=1 python -m unittest test_sokobanSession
+"""
+import os
+import unittest
+
+from sokobanSession import SESSION_MOVES, Jeu, longSession, sessionProblems  # Jeu importé sans son message
+from sokobanXSBLevels import SokobanXSBLevels
+
+QUICK_MOVES = 20000
+
+
+class LongSessionTest(unittest.TestCase):
+    def check(self, moves):
+        canvas, get, staticLayer = Jeu.tk.Canvas, Jeu.SpriteCache.get, Jeu.SpriteCache.staticLayer
+        _, steps, samples = longSession(SokobanXSBLevels[0], moves)
+        self.assertGreater(steps, 0)
+        self.assertEqual(samples[-1][0], moves)
+        self.assertEqual(sessionProblems(samples), [])
+        # Les remplacements du mode sans affichage sont annulés
+        self.assertIs(Jeu.tk.Canvas, canvas)
+        self.assertEqual(Jeu.SpriteCache.get, get)
+        self.assertEqual(Jeu.SpriteCache.staticLayer, staticLayer)
+
+    def testSession(self):
+        self.check(QUICK_MOVES)
+
+    @unittest.skipUnless(os.environ.get('SOKOBAN_LONG_TESTS'), "SOKOBAN_LONG_TESTS non définie")
+    def testLongSession(self):
+        self.check(SESSION_MOVES)
+
+
+if __name__ == "__main__":
+    unittest.main()
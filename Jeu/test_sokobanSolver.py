@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Vérification du mode anytime (sokobanSolver.AnytimeSolver) :
+    - une passe avec macro-poussées qui conclut 'unsolvable' n'arrête pas la recherche (les
+      macro-poussées n'explorent pas tout l'espace d'états) ;
+    - les nœuds et les élagages du résultat sont les totaux de toutes les passes.
+
+Usage :
+    python -m unittest test_sokobanSolver
+"""
+import unittest
+from unittest import mock
+
+from sokobanSolver import AStarSolver, AnytimeSolver, SokobanProblem, SolverResult, solve
+from sokobanXSBLevels import SokobanXSBLevels
+
+LEVEL = SokobanXSBLevels[11]
+
+
+class AnytimeSolverTest(unittest.TestCase):
+    def testMacroPassIsNotAProof(self):
+        astarSolve = AStarSolver.solve
+
+        def macroFailure(search):
+            if search.macros:
+                return SolverResult('unsolvable', nodes=1)  # macro-poussées sans issue
+            return astarSolve(search)
+
+        with mock.patch.object(AStarSolver, 'solve', macroFailure):
+            result = AnytimeSolver(SokobanProblem(LEVEL), macros=True).solve()
+        self.assertEqual(result.status, 'solved')
+        self.assertEqual(result.pushes, solve(LEVEL).pushes)
+
+    def testPrunedTotals(self):
+        passes = []
+        astarSolve = AStarSolver.solve
+
+        def recordedSolve(search):
+            result = astarSolve(search)
+            passes.append((result.nodes, result.prunedFreeze, result.prunedCorral))
+            return result
+
+        with mock.patch.object(AStarSolver, 'solve', recordedSolve):
+            results = list(AnytimeSolver(SokobanProblem(LEVEL)).solutions())
+        self.assertGreater(len(passes), 1)
+        nodes, prunedFreeze, prunedCorral = (sum(column) for column in zip(*passes))
+        last = results[-1]
+        # La dernière solution peut venir de la passe sur les pas, qui ajoute ses propres nœuds et élagages
+        self.assertGreaterEqual(last.nodes, nodes)
+        self.assertGreaterEqual(last.prunedFreeze, prunedFreeze)
+        self.assertGreaterEqual(last.prunedCorral, prunedCorral)
+        first = results[0]
+        self.assertEqual((first.nodes, first.prunedFreeze, first.prunedCorral), passes[0])
+
+
+if __name__ == "__main__":
+    unittest.main()